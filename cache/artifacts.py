@@ -0,0 +1,111 @@
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+from collections.abc import Callable
+from typing import Any, Self
+
+import dash
+
+from cache.tiered import CachePolicy, TieredCache
+from config import get_logger
+from metrics import METRICS
+
+logger = get_logger(__name__)
+
+# Datasets read while a cached callback runs, as (query_json, created_at)
+DEPENDENCIES: contextvars.ContextVar[list[tuple[str, float]] | None] = (
+    contextvars.ContextVar("artifact_dependencies", default=None)
+)
+
+
+def record_dependency(query_json: str, created_at: float) -> None:
+    """Note that the running cached callback read this dataset entry."""
+    dependencies = DEPENDENCIES.get()
+    if dependencies is not None:
+        dependencies.append((query_json, created_at))
+
+
+def _to_json_ready(output: Any) -> Any:
+    # Figures are stored as the dict Dash would send, so hits skip plotly
+    if hasattr(output, "to_plotly_json"):
+        return output.to_plotly_json()
+    return output
+
+
+@functools.cache
+def code_fingerprint(func: Callable) -> str:
+    """Hash of func's source and of the functions it calls by global name.
+
+    One level deep, eg a callback and the table and plot helpers it calls,
+    so a deploy changing them does not serve outputs built by the old code.
+    """
+    functions = [func]
+    for name in func.__code__.co_names:
+        value = func.__globals__.get(name)
+        if inspect.isfunction(value):
+            functions.append(value)
+    source = "".join(inspect.getsource(f) for f in functions)
+    return hashlib.sha1(source.encode()).hexdigest()[:10]
+
+
+class ArtifactCache:
+    """Final outputs of callbacks, eg rowData, columnDefs and figures.
+
+    Keyed on the callback, a hash of its code and one of its inputs. An
+    artifact is reused while every dataset it was built from is still the
+    same cached entry and current, otherwise the callback runs again on the
+    dataset cache.
+    """
+
+    def __init__(
+        self: Self,
+        cache: TieredCache,
+        policy: CachePolicy,
+        is_current: Callable[[str, float], bool],
+    ) -> None:
+        self.cache = cache
+        self.policy = policy
+        self.is_current = is_current
+
+    def _key(self: Self, name: str, args: tuple) -> str:
+        try:
+            triggered_id = dash.ctx.triggered_id
+        except Exception:
+            triggered_id = None
+        inputs = json.dumps([args, triggered_id], sort_keys=True, default=str)
+        digest = hashlib.sha1(inputs.encode()).hexdigest()
+        return f"artifact:{name}:{digest}"
+
+    def cached(self: Self, func: Callable) -> Callable:
+        """Decorate a callback, under @callback, to reuse its outputs."""
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args: Any) -> Any:
+            # Taken at the first call, helpers defined later in the module exist
+            key = self._key(f"{name}:{code_fingerprint(func)}", args)
+            entry, _ = self.cache.get(key)
+            if entry is not None:
+                outputs, dependencies = entry.value
+                if all(self.is_current(q, c) for q, c in dependencies):
+                    METRICS.inc("artifact_hits_total", callback=func.__name__)
+                    return outputs
+            dependencies = []
+            token = DEPENDENCIES.set(dependencies)
+            try:
+                outputs = func(*args)
+            finally:
+                DEPENDENCIES.reset(token)
+            if isinstance(outputs, tuple):
+                outputs = tuple(_to_json_ready(output) for output in outputs)
+            else:
+                outputs = _to_json_ready(outputs)
+            METRICS.inc("artifact_misses_total", callback=func.__name__)
+            if dependencies:
+                value = (outputs, dependencies)
+                self.cache.set(key, self.policy.make_entry(value, dataset_id=name))
+            return outputs
+
+        return wrapper
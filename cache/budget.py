@@ -0,0 +1,162 @@
+import dataclasses
+import pathlib
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Self
+
+from flask_caching import Cache
+
+from cache.locks import LOCK_PREFIX, SharedLocks
+from config import get_logger
+from metrics import METRICS
+
+logger = get_logger(__name__)
+
+# Control key listing every entry of the shared tier, and the lock its
+# read, change and write is done under
+INDEX_KEY = "budget:index"
+INDEX_LOCK_KEY = LOCK_PREFIX + INDEX_KEY
+INDEX_LOCK_TIMEOUT = 10
+
+
+@dataclasses.dataclass
+class StoredEntry:
+    dataset_id: str
+    size_bytes: int
+    expires_at: float
+    # As LocalLRU, priority times load time per MB
+    worth: float
+    # Spilled Arrow file and marker key of the entry, removed with it
+    path: str | None = None
+    marker_key: str | None = None
+
+
+class SharedBudget:
+    """Bytes budget of the shared tier, over what every worker wrote to it.
+
+    cachelib prunes a FileSystemCache by its count of files and Redis
+    evicts by its own maxmemory policy, neither knows the size or the load
+    time of an entry. Each set is listed in an index in the control store
+    with its serialized size. Past max_bytes expired entries are dropped
+    first, then those worth least.
+    """
+
+    def __init__(
+        self: Self,
+        shared: Cache,
+        control: Cache,
+        locks: SharedLocks,
+        max_bytes: int,
+        lock_wait: float = 2.0,
+    ) -> None:
+        self.shared = shared
+        self.control = control
+        self.locks = locks
+        self.max_bytes = max_bytes
+        self.lock_wait = lock_wait
+        self._reported: set[str] = set()
+
+    @contextmanager
+    def _index(self: Self) -> Iterator[dict[str, StoredEntry] | None]:
+        """The index to change in place, None when it stays locked too long."""
+        token = uuid.uuid4().hex
+        deadline = time.time() + self.lock_wait
+        while not self.locks.acquire(INDEX_LOCK_KEY, token, INDEX_LOCK_TIMEOUT):
+            if time.time() > deadline:
+                logger.warning("Shared cache index locked, budget not updated")
+                yield None
+                return
+            time.sleep(0.05)
+        try:
+            index: dict[str, StoredEntry] = self.control.get(INDEX_KEY) or {}
+            yield index
+            self.control.set(INDEX_KEY, index, timeout=0)
+        finally:
+            self.locks.release(INDEX_LOCK_KEY, token)
+
+    def _remove(self: Self, key: str, stored: StoredEntry) -> None:
+        self.shared.delete(key)
+        if stored.marker_key is not None:
+            self.shared.delete(stored.marker_key)
+        if stored.path is not None:
+            pathlib.Path(stored.path).unlink(missing_ok=True)
+
+    def record(self: Self, key: str, stored: StoredEntry) -> None:
+        """List key as written, then evict until the tier fits max_bytes."""
+        if stored.size_bytes > self.max_bytes:
+            logger.warning(f"Not kept in shared cache, over budget {key=}")
+            self._remove(key, stored)
+            return
+        try:
+            with self._index() as index:
+                if index is None:
+                    return
+                index[key] = stored
+                self._prune(index)
+            self.report()
+        except Exception:
+            logger.exception(f"Shared cache budget update failed {key=}")
+
+    def _prune(self: Self, index: dict[str, StoredEntry]) -> None:
+        now = time.time()
+        for key in [key for key, stored in index.items() if now > stored.expires_at]:
+            self._remove(key, index.pop(key))
+        bytes_used = sum(stored.size_bytes for stored in index.values())
+        for key in sorted(index, key=lambda key: index[key].worth):
+            if bytes_used <= self.max_bytes:
+                break
+            stored = index.pop(key)
+            bytes_used -= stored.size_bytes
+            METRICS.inc(
+                "dataset_cache_evictions_total",
+                dataset=stored.dataset_id,
+                tier="shared",
+            )
+            self._remove(key, stored)
+
+    def forget(self: Self, key: str) -> None:
+        try:
+            with self._index() as index:
+                if index is not None:
+                    index.pop(key, None)
+        except Exception:
+            logger.exception(f"Shared cache budget update failed {key=}")
+
+    def clear(self: Self) -> None:
+        self.control.delete(INDEX_KEY)
+
+    def stats(self: Self) -> dict[str, dict[str, float]]:
+        """Entries and bytes held in the shared tier per dataset id."""
+        index: dict[str, StoredEntry] = self.control.get(INDEX_KEY) or {}
+        stats: dict[str, dict[str, float]] = {}
+        now = time.time()
+        for stored in index.values():
+            if now > stored.expires_at:
+                continue
+            dataset = stats.setdefault(stored.dataset_id, {"entries": 0, "bytes": 0})
+            dataset["entries"] += 1
+            dataset["bytes"] += stored.size_bytes
+        return stats
+
+    def report(self: Self) -> None:
+        """Set the shared tier gauges, the index may have changed in any worker."""
+        stats = self.stats()
+        # Datasets evicted since the last report drop to zero
+        for dataset_id in self._reported - stats.keys():
+            stats[dataset_id] = {"entries": 0, "bytes": 0}
+        self._reported = set(stats)
+        for dataset_id, dataset in stats.items():
+            METRICS.set_gauge(
+                "dataset_cache_bytes",
+                dataset["bytes"],
+                dataset=dataset_id,
+                tier="shared",
+            )
+            METRICS.set_gauge(
+                "dataset_cache_entries",
+                dataset["entries"],
+                dataset=dataset_id,
+                tier="shared",
+            )
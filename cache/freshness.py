@@ -0,0 +1,79 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Self
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SourceFreshness:
+    """Tracks a change marker per source table, probed on a short interval.
+
+    probe takes schema.table names and returns a marker for each one it
+    found, the marker changes whenever the table's rows change. Tables are
+    probed once they are watched, ie a dataset reading them was loaded.
+    """
+
+    def __init__(
+        self: Self,
+        probe: Callable[[list[str]], dict[str, str]],
+        interval: float,
+    ) -> None:
+        self.probe = probe
+        self.interval = interval
+        self.versions: dict[str, str] = {}
+        self._watched: set[str] = set()
+        self._lock = threading.Lock()
+        self._monitor: threading.Thread | None = None
+
+    def version(self: Self, relations: list[str]) -> str | None:
+        """Combined marker of relations from the last probe, None if unknown."""
+        versions = self.versions
+        if not all(relation in versions for relation in relations):
+            return None
+        return "|".join(versions[relation] for relation in sorted(relations))
+
+    def current_version(self: Self, relations: list[str]) -> str | None:
+        """Like version, probing relations that have not been probed yet."""
+        with self._lock:
+            new = [relation for relation in relations if relation not in self._watched]
+            self._watched.update(relations)
+        if new:
+            self._probe(new)
+        if self._monitor is None:
+            self._start_monitor()
+        return self.version(relations)
+
+    def _probe(self: Self, relations: list[str]) -> None:
+        try:
+            found = self.probe(relations)
+        except Exception:
+            logger.exception(f"Source freshness probe failed {relations=}")
+            # Unknown markers make cached entries fall back to their ttl
+            with self._lock:
+                self.versions = {}
+            return
+        with self._lock:
+            self.versions = {**self.versions, **found}
+        missing = set(relations) - set(found)
+        if missing:
+            logger.debug(f"No statistics for {missing=}")
+
+    def _start_monitor(self: Self) -> None:
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="source-freshness-probe", daemon=True
+            )
+            self._monitor.start()
+
+    def _monitor_loop(self: Self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = sorted(self._watched)
+            if watched:
+                self._probe(watched)
@@ -0,0 +1,114 @@
+import fcntl
+import hashlib
+import os
+import pathlib
+import threading
+from typing import Protocol, Self
+
+from flask_caching import Cache
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+LOCK_PREFIX = "lock:"
+
+
+class SharedLocks(Protocol):
+    def acquire(self: Self, key: str, token: str, timeout: float) -> bool: ...
+
+    def holder(self: Self, key: str) -> str | None: ...
+
+    def release(self: Self, key: str, token: str) -> None: ...
+
+
+class FileLocks:
+    """Locks held with flock on a file per key, for workers on one host.
+
+    The kernel releases the lock of a worker that dies, so a lock never
+    needs to be taken over and timeout is not used. The file holds the
+    holder's token and is removed on release, an acquire that locked a
+    file removed meanwhile tries again on the new one.
+    """
+
+    def __init__(self: Self, directory: pathlib.Path) -> None:
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self._held: dict[str, tuple[str, int]] = {}
+        self._guard = threading.Lock()
+
+    def _path(self: Self, key: str) -> pathlib.Path:
+        return self.directory / hashlib.sha1(key.encode()).hexdigest()
+
+    def acquire(self: Self, key: str, token: str, timeout: float) -> bool:
+        path = self._path(key)
+        for _ in range(3):
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            try:
+                current = os.stat(path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != os.fstat(fd).st_ino:
+                # Released and removed between open and flock
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.write(fd, token.encode())
+            with self._guard:
+                self._held[key] = (token, fd)
+            return True
+        return False
+
+    def holder(self: Self, key: str) -> str | None:
+        try:
+            fd = os.open(self._path(key), os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Empty while the holder is still writing its token
+            return os.pread(fd, 4096, 0).decode()
+        else:
+            # Left by a worker that died holding it
+            return None
+        finally:
+            os.close(fd)
+
+    def release(self: Self, key: str, token: str) -> None:
+        with self._guard:
+            held = self._held.get(key)
+            if held is None or held[0] != token:
+                return
+            del self._held[key]
+        # Removed while still locked, see acquire
+        self._path(key).unlink(missing_ok=True)
+        os.close(held[1])
+
+
+class CacheLocks:
+    """Locks held as keys added to the shared cache.
+
+    Only as atomic as the backend's add, eg RedisCache uses SET NX while
+    cachelib's FileSystemCache checks and writes separately, use FileLocks
+    for it.
+    """
+
+    def __init__(self: Self, cache: Cache) -> None:
+        self.cache = cache
+
+    def acquire(self: Self, key: str, token: str, timeout: float) -> bool:
+        return bool(self.cache.add(key, token, timeout=int(timeout)))
+
+    def holder(self: Self, key: str) -> str | None:
+        token: str | None = self.cache.get(key)
+        return token
+
+    def release(self: Self, key: str, token: str) -> None:
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
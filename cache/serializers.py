@@ -0,0 +1,136 @@
+import dataclasses
+import io
+import os
+import pathlib
+import pickle
+import time
+import uuid
+from typing import Self
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+PICKLE = "pickle"
+ARROW = "arrow"
+PARQUET = "parquet"
+
+
+@dataclasses.dataclass
+class SerializedFrame:
+    """A DataFrame as stored in the shared tier.
+
+    data holds the bytes, or path points to an Arrow IPC file when the frame
+    was large enough to be memory mapped on read.
+    """
+
+    kind: str
+    data: bytes | None = None
+    path: str | None = None
+    size_bytes: int = 0
+
+
+class FrameSerializer:
+    """Writes DataFrames as Arrow IPC, zstd Parquet or pickle.
+
+    Frames Arrow cannot convert, eg object columns of mixed types, fall back
+    to pickle. With a spill_dir on the same disk as every worker, frames of
+    mmap_min_bytes and more are written there as Arrow IPC files and memory
+    mapped on read instead of being copied through the cache backend.
+    """
+
+    def __init__(
+        self: Self,
+        kind: str,
+        spill_dir: pathlib.Path | None = None,
+        mmap_min_bytes: int = 8_000_000,
+    ) -> None:
+        if kind != PICKLE and pa is None:
+            logger.warning(f"pyarrow missing, cache serializer {kind} -> pickle")
+            kind = PICKLE
+        self.kind = kind
+        self.spill_dir = spill_dir
+        self.mmap_min_bytes = mmap_min_bytes
+        if spill_dir is not None and kind != PICKLE:
+            spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def dumps(self: Self, df: pd.DataFrame, expires_at: float) -> SerializedFrame:
+        """Serialize df, a spilled file is kept until expires_at."""
+        if self.kind == PICKLE:
+            return self._pickle(df)
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowException, TypeError, ValueError):
+            logger.warning("Frame not convertible to Arrow, pickled instead")
+            return self._pickle(df)
+        if self.kind == PARQUET:
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression="zstd")
+            data = buffer.getvalue()
+            return SerializedFrame(PARQUET, data=data, size_bytes=len(data))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+        if self.spill_dir is not None and buffer.size >= self.mmap_min_bytes:
+            self.sweep()
+            path = self.spill_dir / f"{int(expires_at)}-{uuid.uuid4().hex}.arrow"
+            # Write then rename so readers never map a partial file
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(buffer)
+            os.replace(tmp_path, path)
+            return SerializedFrame(ARROW, path=str(path), size_bytes=buffer.size)
+        data = buffer.to_pybytes()
+        return SerializedFrame(ARROW, data=data, size_bytes=len(data))
+
+    def _pickle(self: Self, df: pd.DataFrame) -> SerializedFrame:
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        return SerializedFrame(PICKLE, data=data, size_bytes=len(data))
+
+    def loads(
+        self: Self, frame: SerializedFrame, columns: list[str] | None = None
+    ) -> pd.DataFrame:
+        """DataFrame of frame, only columns when given."""
+        if frame.kind == PICKLE:
+            assert frame.data is not None
+            df: pd.DataFrame = pickle.loads(frame.data)
+            return df[columns] if columns else df
+        if frame.kind == PARQUET:
+            table = pq.read_table(pa.BufferReader(frame.data), columns=columns)
+        elif frame.path is not None:
+            with pa.memory_map(frame.path) as source:
+                table = pa.ipc.open_file(source).read_all()
+                if columns:
+                    table = table.select(columns)
+                return table.to_pandas()
+        else:
+            table = pa.ipc.open_file(pa.BufferReader(frame.data)).read_all()
+        if columns and frame.kind == ARROW:
+            table = table.select(columns)
+        return table.to_pandas()
+
+    def sweep(self: Self) -> None:
+        """Remove spilled files whose entries have expired.
+
+        Files are named by the expiry of the entry that wrote them, replaced
+        entries write a new file and leave the old one to this sweep.
+        """
+        if self.spill_dir is None:
+            return
+        now = time.time()
+        for path in self.spill_dir.glob("*.arrow"):
+            try:
+                if int(path.name.split("-", 1)[0]) < now:
+                    path.unlink()
+            except (ValueError, FileNotFoundError):
+                continue
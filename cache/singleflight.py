@@ -0,0 +1,174 @@
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Self
+
+from cache.locks import LOCK_PREFIX, SharedLocks
+from cache.tiered import CacheEntry, TieredCache
+from config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SingleFlight:
+    """Runs one load per cache key at a time and hands its result to every caller.
+
+    Threads of a worker queue on a per key lock, workers coordinate through
+    locks, see cache.locks. Callers that did not load poll the shared tier
+    until the loading worker has stored the entry.
+    """
+
+    def __init__(
+        self: Self,
+        cache: TieredCache,
+        locks: SharedLocks,
+        lock_timeout: float,
+        wait_timeout: float,
+        poll_interval: float = 0.1,
+        refresh_threads: int = 4,
+    ) -> None:
+        self.cache = cache
+        self.locks = locks
+        # Shared lock expires on its own if the worker holding it dies
+        self.lock_timeout = lock_timeout
+        # Waiters give up after this long and run the load themselves
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._locks: dict[str, tuple[threading.Lock, int]] = {}
+        self._locks_guard = threading.Lock()
+        self._refreshing: set[str] = set()
+        self._refresh_pool = ThreadPoolExecutor(
+            max_workers=refresh_threads, thread_name_prefix="cache-refresh"
+        )
+
+    @contextmanager
+    def _local_lock(self: Self, key: str) -> Iterator[None]:
+        with self._locks_guard:
+            lock, users = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._locks_guard:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    def _acquire_shared(self: Self, lock_key: str, token: str) -> bool:
+        try:
+            return self.locks.acquire(lock_key, token, self.lock_timeout)
+        except Exception:
+            # Without the shared tier fall back to coalescing within the worker
+            logger.exception(f"Shared lock failed {lock_key=}")
+            return True
+
+    def _release_shared(self: Self, lock_key: str, token: str) -> None:
+        try:
+            self.locks.release(lock_key, token)
+        except Exception:
+            logger.exception(f"Shared lock release failed {lock_key=}")
+
+    def _get_accepted_shared(
+        self: Self, key: str, accept: Callable[[CacheEntry], bool]
+    ) -> CacheEntry | None:
+        """Shared entry for key if accepted, its marker is checked before loading it."""
+        # The local tier may still hold the entry being replaced
+        marker = self.cache.get_marker(key, local=False)
+        if marker is None or not accept(marker):
+            return None
+        entry = self.cache.get_shared(key)
+        if entry is None or not accept(entry):
+            return None
+        return entry
+
+    def _wait_for_other_worker(
+        self: Self,
+        key: str,
+        lock_key: str,
+        accept: Callable[[CacheEntry], bool],
+    ) -> CacheEntry | None:
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self._get_accepted_shared(key, accept)
+            if entry is not None:
+                return entry
+            try:
+                if self.locks.holder(lock_key) is None:
+                    # Loader finished without storing, eg its query failed
+                    return None
+            except Exception:
+                return None
+        logger.warning(f"Gave up waiting for {key=} after {self.wait_timeout}s")
+        return None
+
+    def load(
+        self: Self,
+        key: str,
+        loader: Callable[[], CacheEntry],
+        accept: Callable[[CacheEntry], bool],
+    ) -> tuple[CacheEntry, bool]:
+        """Entry for key and whether this call ran loader.
+
+        accept decides if an entry found in the cache can be used instead of
+        loading, eg CacheEntry.is_fresh.
+        """
+        lock_key = LOCK_PREFIX + key
+        with self._local_lock(key):
+            entry, _ = self.cache.get(key)
+            if entry is not None and accept(entry):
+                return entry, False
+            # Another worker may have stored a newer entry than the local one
+            entry = self._get_accepted_shared(key, accept)
+            if entry is not None:
+                return entry, False
+            token = uuid.uuid4().hex
+            if not self._acquire_shared(lock_key, token):
+                entry = self._wait_for_other_worker(key, lock_key, accept)
+                if entry is not None:
+                    return entry, False
+                self._acquire_shared(lock_key, token)
+            try:
+                entry = loader()
+                self.cache.set(key, entry)
+            finally:
+                self._release_shared(lock_key, token)
+            return entry, True
+
+    def in_flight(self: Self) -> list[str]:
+        """Keys this worker is loading or has queued for a background refresh."""
+        with self._locks_guard:
+            return sorted(set(self._locks) | self._refreshing)
+
+    def refresh_in_background(
+        self: Self,
+        key: str,
+        loader: Callable[[], CacheEntry],
+        accept: Callable[[CacheEntry], bool],
+    ) -> bool:
+        """Queue a load of key unless one is already queued, returns if queued.
+
+        Used to replace a stale entry while callers keep getting the stale one.
+        """
+        with self._locks_guard:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def refresh() -> None:
+            try:
+                self.load(key, loader, accept)
+            except Exception:
+                logger.exception(f"Background refresh failed {key=}")
+            finally:
+                with self._locks_guard:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(refresh)
+        return True
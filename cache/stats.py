@@ -0,0 +1,79 @@
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable
+from typing import Self
+
+from flask_caching import Cache
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+WORKERS_KEY = "stats:workers"
+WORKER_KEY_PREFIX = "stats:worker:"
+
+
+class WorkerStats:
+    """Publishes this worker's cache and query stats to the control store.
+
+    Every interval each worker stores collect() under its host and pid and
+    lists them in WORKERS_KEY, pids repeat across the nodes sharing a Redis.
+    Snapshots expire after three missed intervals so stopped workers drop
+    out. Any worker can then read all of them.
+    """
+
+    def __init__(
+        self: Self,
+        control: Cache,
+        collect: Callable[[], dict],
+        interval: float,
+    ) -> None:
+        self.control = control
+        self.collect = collect
+        self.interval = interval
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self: Self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="worker-stats", daemon=True
+            )
+            self._thread.start()
+
+    def publish(self: Self) -> None:
+        # Read each time, a forked worker has a new pid
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        timeout = int(self.interval * 3)
+        snapshot = {"worker": worker, "published_at": time.time(), **self.collect()}
+        self.control.set(f"{WORKER_KEY_PREFIX}{worker}", snapshot, timeout=timeout)
+        # Read, add and write back, a lost update heals on the next interval
+        workers = set(self.control.get(WORKERS_KEY) or [])
+        if worker not in workers:
+            workers.add(worker)
+            self.control.set(WORKERS_KEY, sorted(workers), timeout=0)
+
+    def read_all(self: Self) -> list[dict]:
+        """Latest snapshot of every live worker, this one freshly collected."""
+        self.publish()
+        snapshots = []
+        live = []
+        for worker in self.control.get(WORKERS_KEY) or []:
+            snapshot = self.control.get(f"{WORKER_KEY_PREFIX}{worker}")
+            if snapshot is not None:
+                snapshots.append(snapshot)
+                live.append(worker)
+        self.control.set(WORKERS_KEY, live, timeout=0)
+        return snapshots
+
+    def _loop(self: Self) -> None:
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Worker stats publish failed")
+            time.sleep(self.interval)
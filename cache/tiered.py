@@ -0,0 +1,418 @@
+import dataclasses
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Self
+
+import pandas as pd
+from flask_caching import Cache
+
+from cache.budget import SharedBudget, StoredEntry
+from cache.serializers import FrameSerializer, SerializedFrame
+from config import get_logger
+from metrics import BYTES_BUCKETS, METRICS
+
+logger = get_logger(__name__)
+
+# With Copy-on-Write (always on from pandas 3) a shallow copy is enough to
+# keep callers that add or replace columns from changing the cached frame
+SHALLOW_COPY_IS_SAFE = int(pd.__version__.split(".")[0]) >= 3
+
+# Bump when CacheEntry or the dtypes of cached frames change. Entries are
+# pickled, so the pandas version that wrote them is part of the namespace too
+CACHE_FORMAT_VERSION = 4
+FORMAT_NAMESPACE = (
+    f"v{CACHE_FORMAT_VERSION}-pd{'.'.join(pd.__version__.split('.')[:2])}"
+)
+
+# Control key holding the generation clear() moves on, and how often each
+# worker re-reads it
+GENERATION_KEY = "cache:generation"
+GENERATION_CHECK_SECONDS = 10
+
+# Shared keys holding entries without their value, see get_marker
+MARKER_PREFIX = "marker:"
+
+
+@dataclasses.dataclass(frozen=True)
+class CachePolicy:
+    """How long a dataset is cached.
+
+    ttl: seconds an entry is fresh
+    max_staleness: seconds past ttl an expired entry is still served while
+        a background refresh replaces it
+    priority: higher priority entries are evicted last
+    """
+
+    ttl: float
+    max_staleness: float = 0
+    priority: int = 1
+
+    def make_entry(
+        self: Self,
+        value: Any,
+        dataset_id: str = "",
+        load_seconds: float = 0,
+        full_load_at: float | None = None,
+        source_version: str | None = None,
+    ) -> "CacheEntry":
+        now = time.time()
+        return CacheEntry(
+            value=value,
+            created_at=now,
+            fresh_until=now + self.ttl,
+            expires_at=now + self.ttl + self.max_staleness,
+            priority=self.priority,
+            dataset_id=dataset_id,
+            size_bytes=value_size(value),
+            load_seconds=load_seconds,
+            full_load_at=full_load_at or now,
+            source_version=source_version,
+        )
+
+    def renew(self: Self, entry: "CacheEntry") -> "CacheEntry":
+        """entry with its ttl and staleness starting over from now.
+
+        created_at is kept, it identifies the loaded value.
+        """
+        now = time.time()
+        return dataclasses.replace(
+            entry,
+            fresh_until=now + self.ttl,
+            expires_at=now + self.ttl + self.max_staleness,
+        )
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    value: Any
+    created_at: float
+    fresh_until: float
+    # Entries are dropped from every tier after expires_at
+    expires_at: float
+    priority: int = 1
+    dataset_id: str = ""
+    # Measured in memory size and the query time it would cost to rebuild,
+    # both weigh in on which local entry is evicted
+    size_bytes: int = 0
+    load_seconds: float = 0
+    # Incremental refreshes only reload recent rows and keep this time of
+    # the last complete load
+    full_load_at: float = 0
+    # Change marker of the source tables when the value was loaded
+    source_version: str | None = None
+
+    def is_fresh(self: Self) -> bool:
+        return time.time() < self.fresh_until
+
+
+def value_size(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    # Nested lists and dicts, eg callback outputs, are measured pickled
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def entry_worth(entry: CacheEntry, size_bytes: int) -> float:
+    """Priority times load time per MB, the least worth is evicted first."""
+    return entry.priority * (1 + entry.load_seconds) / (max(size_bytes, 1) / 1e6)
+
+
+def copy_value(value: Any) -> Any:
+    """Hand callers their own DataFrame, they often add an id column in place."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=not SHALLOW_COPY_IS_SAFE)
+    return value
+
+
+class LocalLRU:
+    """Live objects for one worker process, hits skip disk and unpickling.
+
+    Bounded by max_bytes of measured DataFrame memory and max_entries.
+    Eviction is GreedyDual-Size: each entry is worth its priority times its
+    load time per MB plus the worth of the last evicted entry at its last
+    hit, so cheap, large or long unused entries go first.
+    """
+
+    def __init__(self: Self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._worth: dict[str, float] = {}
+        self._inflation = 0.0
+        self._reported: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _touch(self: Self, key: str, entry: CacheEntry) -> None:
+        self._worth[key] = self._inflation + entry_worth(entry, entry.size_bytes)
+        self._entries.move_to_end(key)
+
+    def _remove(self: Self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._worth.pop(key, None)
+        self.bytes_used -= entry.size_bytes
+
+    def get(self: Self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() > entry.expires_at:
+                self._remove(key)
+                return None
+            self._touch(key, entry)
+            return entry
+
+    def set(self: Self, key: str, entry: CacheEntry) -> None:
+        if entry.size_bytes > self.max_bytes:
+            logger.warning(
+                f"Not kept in memory, over budget {key=} {entry.size_bytes=}"
+            )
+            self.delete(key)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.bytes_used += entry.size_bytes
+            self._touch(key, entry)
+            while (
+                len(self._entries) > self.max_entries
+                or self.bytes_used > self.max_bytes
+            ):
+                self._evict_one()
+        self._report()
+
+    def _evict_one(self: Self) -> None:
+        """Drop the entry worth least, the least recently used on ties."""
+        key = min(self._entries, key=self._worth.__getitem__)
+        self._inflation = self._worth[key]
+        METRICS.inc(
+            "dataset_cache_evictions_total",
+            dataset=self._entries[key].dataset_id,
+            tier="local",
+        )
+        self._remove(key)
+
+    def stats(self: Self) -> dict[str, dict[str, float]]:
+        """Entries, bytes and the oldest load time held per dataset id."""
+        stats: dict[str, dict[str, float]] = {}
+        with self._lock:
+            for entry in self._entries.values():
+                dataset = stats.setdefault(
+                    entry.dataset_id,
+                    {"entries": 0, "bytes": 0, "oldest_created_at": entry.created_at},
+                )
+                dataset["entries"] += 1
+                dataset["bytes"] += entry.size_bytes
+                dataset["oldest_created_at"] = min(
+                    dataset["oldest_created_at"], entry.created_at
+                )
+        return stats
+
+    def _report(self: Self) -> None:
+        stats = self.stats()
+        # Datasets evicted since the last report drop to zero
+        for dataset_id in self._reported - stats.keys():
+            stats[dataset_id] = {"entries": 0, "bytes": 0, "oldest_created_at": 0}
+        self._reported = set(stats)
+        for dataset_id, dataset in stats.items():
+            METRICS.set_gauge(
+                "dataset_cache_bytes",
+                dataset["bytes"],
+                dataset=dataset_id,
+                tier="local",
+            )
+            METRICS.set_gauge(
+                "dataset_cache_entries",
+                dataset["entries"],
+                dataset=dataset_id,
+                tier="local",
+            )
+
+    def delete(self: Self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._worth.clear()
+            self.bytes_used = 0
+
+
+class TieredCache:
+    """In process LRU in front of a flask_caching store shared by all workers.
+
+    The shared store is whatever CACHE_TYPE configures, RedisCache for
+    workers on several nodes, FileSystemCache for one node or SimpleCache
+    as an in memory stand-in for tests. Shared hits are promoted into the
+    local LRU so repeat hits in the same worker cost a dict lookup.
+    DataFrames are written to the shared tier by serializer, as Arrow IPC
+    or Parquet rather than pickled with the entry. budget keeps the bytes
+    of the shared tier under a limit.
+
+    control is a store for small keys that must not be evicted with the
+    data, the generation, worker stats and locks. It can be the shared
+    store when that only evicts expired keys first, eg Redis volatile-lru.
+
+    Keys are prefixed with the entry format and a generation, entries
+    outlive worker restarts and clear() moves every worker to a new
+    generation within GENERATION_CHECK_SECONDS.
+    """
+
+    LOCAL = "local"
+    SHARED = "shared"
+
+    def __init__(
+        self: Self,
+        shared: Cache,
+        control: Cache,
+        local_max_entries: int,
+        local_max_bytes: int,
+        serializer: FrameSerializer,
+        budget: SharedBudget | None = None,
+    ) -> None:
+        self.shared = shared
+        self.control = control
+        self.serializer = serializer
+        self.budget = budget
+        self.local = LocalLRU(local_max_entries, local_max_bytes)
+        self._generation = 0
+        self._generation_checked_at = 0.0
+
+    def generation(self: Self) -> int:
+        if time.time() - self._generation_checked_at > GENERATION_CHECK_SECONDS:
+            try:
+                self._generation = int(self.control.get(GENERATION_KEY) or 0)
+            except Exception:
+                logger.exception("Shared cache generation read failed")
+            self._generation_checked_at = time.time()
+        return self._generation
+
+    def _namespaced(self: Self, key: str) -> str:
+        return f"{FORMAT_NAMESPACE}.g{self.generation()}:{key}"
+
+    def get(
+        self: Self, key: str, columns: list[str] | None = None
+    ) -> tuple[CacheEntry | None, str | None]:
+        """Entry for key and the tier that served it, (None, None) on a miss.
+
+        With columns a DataFrame entry only holds those columns, read from
+        the shared tier without loading the others or promoting it.
+        """
+        key = self._namespaced(key)
+        entry = self.local.get(key)
+        if entry is not None:
+            if columns:
+                entry = dataclasses.replace(entry, value=entry.value[columns])
+            return entry, self.LOCAL
+        entry = self._get_shared(key, columns)
+        if entry is None:
+            return None, None
+        return entry, self.SHARED
+
+    def get_shared(self: Self, key: str) -> CacheEntry | None:
+        """Entry for key from the shared tier, replacing the local copy."""
+        return self._get_shared(self._namespaced(key))
+
+    def get_marker(self: Self, key: str, local: bool = True) -> CacheEntry | None:
+        """Entry for key with value None, read without loading its DataFrame.
+
+        Enough to tell which load is cached and whether it is current.
+        local=False skips the local tier, eg while another worker replaces it.
+        """
+        entry = self.local.get(self._namespaced(key)) if local else None
+        if entry is not None:
+            return dataclasses.replace(entry, value=None)
+        try:
+            marker: CacheEntry | None = self.shared.get(
+                self._namespaced(MARKER_PREFIX + key)
+            )
+        except Exception:
+            logger.exception(f"Shared cache marker get failed {key=}")
+            return None
+        if marker is None or time.time() > marker.expires_at:
+            return None
+        return marker
+
+    def _get_shared(
+        self: Self, key: str, columns: list[str] | None = None
+    ) -> CacheEntry | None:
+        try:
+            entry: CacheEntry | None = self.shared.get(key)
+            if entry is None or time.time() > entry.expires_at:
+                return None
+            if isinstance(entry.value, SerializedFrame):
+                value = self.serializer.loads(entry.value, columns=columns)
+                entry = dataclasses.replace(entry, value=value)
+        except Exception:
+            logger.exception(f"Shared cache get failed {key=}")
+            return None
+        if not columns:
+            self.local.set(key, entry)
+        return entry
+
+    def set(self: Self, key: str, entry: CacheEntry) -> None:
+        marker_key = self._namespaced(MARKER_PREFIX + key)
+        key = self._namespaced(key)
+        self.local.set(key, entry)
+        timeout = max(1, int(entry.expires_at - time.time()))
+        try:
+            stored = entry
+            size_bytes = entry.size_bytes
+            path = None
+            marker = dataclasses.replace(entry, value=None)
+            self.shared.set(marker_key, marker, timeout=timeout)
+            if isinstance(entry.value, pd.DataFrame):
+                frame = self.serializer.dumps(entry.value, entry.expires_at)
+                stored = dataclasses.replace(entry, value=frame)
+                size_bytes, path = frame.size_bytes, frame.path
+                METRICS.observe(
+                    "dataset_cache_serialized_bytes",
+                    frame.size_bytes,
+                    buckets=BYTES_BUCKETS,
+                    dataset=entry.dataset_id,
+                    format=frame.kind,
+                )
+            self.shared.set(key, stored, timeout=timeout)
+        except Exception:
+            logger.exception(f"Shared cache set failed {key=}")
+            return
+        if self.budget is not None:
+            self.budget.record(
+                key,
+                StoredEntry(
+                    dataset_id=entry.dataset_id,
+                    size_bytes=size_bytes,
+                    expires_at=entry.expires_at,
+                    worth=entry_worth(entry, size_bytes),
+                    path=path,
+                    marker_key=marker_key,
+                ),
+            )
+
+    def delete(self: Self, key: str) -> None:
+        self.shared.delete(self._namespaced(MARKER_PREFIX + key))
+        key = self._namespaced(key)
+        self.local.delete(key)
+        self.shared.delete(key)
+        if self.budget is not None:
+            self.budget.forget(key)
+
+    def clear(self: Self) -> int:
+        """Drop every entry of every worker, returns the new generation."""
+        self._generation_checked_at = 0.0
+        generation = self.generation() + 1
+        self.local.clear()
+        self.shared.clear()
+        if self.budget is not None:
+            self.budget.clear()
+        self.control.set(GENERATION_KEY, generation, timeout=0)
+        self._generation = generation
+        self._generation_checked_at = time.time()
+        logger.warning(f"Cache cleared, now on {generation=}")
+        return generation
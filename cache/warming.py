@@ -0,0 +1,83 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Self
+
+from cache.tiered import CacheEntry
+from config import get_logger
+from metrics import METRICS
+
+logger = get_logger(__name__)
+
+
+class CacheWarmer:
+    """Loads the default datasets of each tab after boot and again before they expire.
+
+    targets returns the query dicts to keep warm, it is called every round so
+    date based inputs such as the last 30 days move along. warm loads one
+    query dict if its cached entry is missing or close to expiry and returns
+    the cached entry.
+    """
+
+    def __init__(
+        self: Self,
+        targets: Callable[[], list[dict]],
+        warm: Callable[[dict], CacheEntry],
+        lead_seconds: float,
+        min_interval: float = 30,
+        retry_seconds: float = 300,
+    ) -> None:
+        self.targets = targets
+        self.warm = warm
+        # Re-warm an entry this many seconds before it stops being fresh
+        self.lead_seconds = lead_seconds
+        self.min_interval = min_interval
+        self.retry_seconds = retry_seconds
+        self.progress: dict[str, float | int | None] = {
+            "done": 0,
+            "total": 0,
+            "failed": 0,
+            "last_duration": None,
+        }
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self: Self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="cache-warmer", daemon=True
+            )
+            self._thread.start()
+
+    def warm_all(self: Self) -> float:
+        """Warm every target, returns the epoch time the next round is due."""
+        start = time.perf_counter()
+        targets = self.targets()
+        self.progress.update(done=0, total=len(targets), failed=0)
+        next_due = time.time() + 3600.0
+        for i, query_dict in enumerate(targets, start=1):
+            try:
+                entry = self.warm(query_dict)
+                next_due = min(next_due, entry.fresh_until - self.lead_seconds)
+            except Exception:
+                logger.exception(f"Cache warm failed {query_dict=}")
+                next_due = min(next_due, time.time() + self.retry_seconds)
+                self.progress["failed"] = int(self.progress["failed"] or 0) + 1
+                METRICS.inc("cache_warm_failures_total", dataset=query_dict["id"])
+            self.progress["done"] = i
+            logger.info(f"Cache warm {i}/{len(targets)} {query_dict=}")
+        duration = time.perf_counter() - start
+        self.progress["last_duration"] = duration
+        METRICS.observe("cache_warm_seconds", duration)
+        logger.info(
+            f"Cache warm finished {len(targets)} datasets in {duration:.1f}s "
+            f"failed={self.progress['failed']}"
+        )
+        return next_due
+
+    def _loop(self: Self) -> None:
+        while True:
+            next_due = self.warm_all()
+            time.sleep(max(self.min_interval, next_due - time.time()))
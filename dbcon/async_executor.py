@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures
+import datetime
+import threading
+from typing import Any, Self
+
+import pandas as pd
+
+from config import CONFIG, get_logger
+from dbcon.connections import PostgresCon
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+logger = get_logger(__name__)
+
+
+async def _init_connection(conn: Any) -> None:
+    # Dates go over the wire as text so ISO date strings bind like they do
+    # with psycopg, and come back as datetime.date like pd.read_sql
+    await conn.set_type_codec(
+        "date",
+        schema="pg_catalog",
+        encoder=lambda value: value if isinstance(value, str) else value.isoformat(),
+        decoder=datetime.date.fromisoformat,
+        format="text",
+    )
+
+
+class AsyncQueryExecutor:
+    """Runs queries on an asyncpg pool inside one background event loop.
+
+    Dash callbacks stay synchronous, run() hands the query to the loop
+    thread and waits for the frame. Concurrent callbacks in the same worker
+    share the loop, so many queries are in flight at once over a small
+    pool instead of each thread blocking on its own connection.
+
+    Queries use $1 style placeholders, see dbcon.queries.to_numbered_params.
+    """
+
+    def __init__(self: Self, dbcon: PostgresCon) -> None:
+        if asyncpg is None:
+            raise ImportError("Async query execution requires asyncpg")
+        self.dbcon = dbcon
+        server_config = CONFIG.get(dbcon.config_name, {})
+        self.min_size = server_config.get("async_pool_min_size", 2)
+        self.max_size = server_config.get("async_pool_max_size", 20)
+        self.pool: Any = None
+        self._pool_address: tuple | None = None
+        self._pool_lock: asyncio.Lock | None = None
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="async-query-loop", daemon=True
+        )
+        self._thread.start()
+
+    async def _get_pool(self: Self) -> Any:
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            address = self.dbcon.refresh_address()
+            if self.pool is None or address != self._pool_address:
+                if self.pool is not None:
+                    logger.info(f"Async pool address changed {address=}")
+                    await self.pool.close()
+                db_ip, db_port = address
+                self.pool = await asyncpg.create_pool(
+                    host=db_ip,
+                    port=db_port,
+                    user=self.dbcon.db_user,
+                    password=self.dbcon.db_pass,
+                    database=self.dbcon.database,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    init=_init_connection,
+                    server_settings={"application_name": "app-store-dash"},
+                )
+                self._pool_address = address
+        return self.pool
+
+    async def fetch_frame(self: Self, sel_query: str, values: tuple) -> pd.DataFrame:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            # fetch goes through the connection's prepared statement cache
+            records = await conn.fetch(sel_query, *values)
+            if records:
+                columns = list(records[0].keys())
+            else:
+                # An empty result has no records to read the names from
+                statement = await conn.prepare(sel_query)
+                columns = [attribute.name for attribute in statement.get_attributes()]
+        # NUMERIC arrives as Decimal, coerce to float like pd.read_sql
+        df = pd.DataFrame.from_records(
+            [tuple(record) for record in records], columns=columns, coerce_float=True
+        )
+        return df
+
+    def submit(
+        self: Self, sel_query: str, values: tuple = ()
+    ) -> concurrent.futures.Future:
+        """Start a query without waiting, result() returns the DataFrame."""
+        return asyncio.run_coroutine_threadsafe(
+            self.fetch_frame(sel_query, values), self.loop
+        )
+
+    def run(self: Self, sel_query: str, values: tuple = ()) -> pd.DataFrame:
+        """Sync facade for callbacks, blocks only the calling thread."""
+        df: pd.DataFrame = self.submit(sel_query, values).result()
+        return df
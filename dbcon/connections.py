@@ -1,12 +1,79 @@
-from typing import Self
+import threading
+import time
+from typing import Any, Self
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
 from sshtunnel import SSHTunnelForwarder
 
 from config import CONFIG, get_logger
 
+try:
+    import adbc_driver_postgresql.dbapi as adbc_postgres
+except ImportError:
+    adbc_postgres = None
+
 logger = get_logger(__name__)
 
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+    "pool_timeout": 30,
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool which records how long callers wait for a connection."""
+
+    def __init__(self: Self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeout_count = 0
+
+    def connect(self: Self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeout_count += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self: Self) -> dict:
+        with self._stats_lock:
+            avg_wait = (
+                self.wait_seconds_total / self.wait_count if self.wait_count else 0.0
+            )
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "timeouts": self.timeout_count,
+                "wait_count": self.wait_count,
+                "wait_seconds_avg": avg_wait,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+def get_pool_settings(server_name: str) -> dict:
+    """Pool settings for server_name, config.toml values override POOL_DEFAULTS."""
+    server_config = CONFIG.get(server_name, {})
+    settings = {k: server_config.get(k, v) for k, v in POOL_DEFAULTS.items()}
+    return settings
+
 
 class PostgresCon:
     """Class for managing the connection to postgres.
@@ -32,8 +99,13 @@ class PostgresCon:
     ) -> None:
         """Initialize connection with ports and dbname."""
         self.db_name = my_db
+        # Stays the config section name when db_name is cleared on failure
+        self.config_name = my_db
+        # Replica sections name their database, the primary's section name is its database
+        self.database = CONFIG.get(my_db, {}).get("database", my_db)
         self.db_ip = db_ip
         self.db_port = db_port
+        self._arrow_local = threading.local()
         try:
             self.db_user = CONFIG[self.db_name]["db_user"]
             self.db_pass = CONFIG[self.db_name]["db_password"]
@@ -45,16 +117,26 @@ class PostgresCon:
     def set_engine(self: Self) -> None:
         """Set postgresql engine."""
         try:
-            self.db_uri = f"postgresql://{self.db_user}:{self.db_pass}"
-            self.db_uri += f"@{self.db_ip}:{self.db_port}/{self.db_name}"
+            self.db_uri = f"postgresql+psycopg://{self.db_user}:{self.db_pass}"
+            self.db_uri += f"@{self.db_ip}:{self.db_port}/{self.database}"
+            pool_settings = get_pool_settings(self.config_name)
             self.engine = create_engine(
                 self.db_uri,
+                poolclass=InstrumentedQueuePool,
                 connect_args={
                     "connect_timeout": 10,
                     "application_name": "app-store-dash",
+                    # psycopg prepares a statement server side once it has
+                    # run this many times on a connection
+                    "prepare_threshold": CONFIG[self.config_name].get(
+                        "prepare_threshold", 2
+                    ),
                 },
+                **pool_settings,
             )
-            logger.info(f"Created PostgreSQL Engine {self.db_name}")
+            if self.db_name in TUNNELS:
+                event.listen(self.engine, "do_connect", self._use_current_tunnel)
+            logger.info(f"Created PostgreSQL Engine {self.db_name} {pool_settings=}")
         except Exception as error:
             msg = (
                 f"PostgresCon failed to connect to {self.db_name}@{self.db_ip} {error=}"
@@ -62,27 +144,157 @@ class PostgresCon:
             logger.exception(msg)
             self.db_name = None
 
+    def _use_current_tunnel(
+        self: Self, dialect: Any, conn_rec: Any, cargs: Any, cparams: dict
+    ) -> None:
+        """Point new connections at the live tunnel port, which changes on reconnect."""
+        manager = TUNNELS[self.config_name]
+        manager.ensure_alive()
+        self.db_ip, self.db_port = manager.local_address()
+        cparams["host"] = self.db_ip
+        cparams["port"] = self.db_port
+
+    def refresh_address(self: Self) -> tuple[str | None, str | None]:
+        """Current host and port, the SSH tunnel port can change on reconnect."""
+        if self.db_name in TUNNELS:
+            self.db_ip, self.db_port = TUNNELS[self.db_name].local_address()
+        return self.db_ip, self.db_port
+
+    def get_arrow_connection(self: Self) -> Any:
+        """ADBC connection for columnar Arrow fetches, one per thread.
+
+        Requires the optional adbc-driver-postgresql package.
+        """
+        if adbc_postgres is None:
+            raise ImportError("Arrow fetch requires adbc-driver-postgresql")
+        self.refresh_address()
+        uri = f"postgresql://{self.db_user}:{self.db_pass}"
+        uri += f"@{self.db_ip}:{self.db_port}/{self.database}"
+        conn = getattr(self._arrow_local, "conn", None)
+        if conn is None or self._arrow_local.uri != uri:
+            if conn is not None:
+                conn.close()
+            conn = adbc_postgres.connect(uri, autocommit=True)
+            self._arrow_local.conn = conn
+            self._arrow_local.uri = uri
+        return conn
+
+    def get_pool_stats(self: Self) -> dict:
+        """Live connection pool statistics, empty if the engine is not set."""
+        if self.engine is None or not isinstance(
+            self.engine.pool, InstrumentedQueuePool
+        ):
+            return {}
+        return self.engine.pool.stats()
+
 
 def open_ssh_tunnel(server_name: str) -> SSHTunnelForwarder:
-    """Create SSH tunnel when working remotely."""
+    """Create SSH tunnel when working remotely, caller is responsible for start()."""
 
     ssh_port = CONFIG[server_name].get("ssh_port", 22)
     ssh_host = CONFIG[server_name]["host"]
     ssh_username = CONFIG[server_name]["os_user"]
     ssh_pkey = CONFIG[server_name].get("ssh_pkey", None)
     ssh_private_key_password = CONFIG[server_name].get("ssh_pkey_password", None)
-    with SSHTunnelForwarder(
+    ssh_keepalive = CONFIG[server_name].get("ssh_keepalive", 30.0)
+    server = SSHTunnelForwarder(
         (ssh_host, ssh_port),  # Remote server IP and SSH port
         ssh_username=ssh_username,
         ssh_pkey=ssh_pkey,
         ssh_private_key_password=ssh_private_key_password,
         remote_bind_address=("127.0.0.1", 5432),
-    ) as server:  # PostgreSQL server IP and sever port on remote machine
-        logger.info(f"Start SSH tunnel to {server_name=}")
-        logger.info(f"Opened SSH Tunnel {server_name=}")
+        set_keepalive=ssh_keepalive,
+    )  # PostgreSQL server IP and sever port on remote machine
     return server
 
 
+class SSHTunnelManager:
+    """Owns one long lived SSH tunnel to a server and reopens it when it dies.
+
+    A background thread probes the tunnel every ssh_probe_interval seconds.
+    The local port can change after a reconnect, so engines should read it
+    through local_address() each time they open a connection.
+    """
+
+    def __init__(self: Self, server_name: str) -> None:
+        self.server_name = server_name
+        self.probe_interval = CONFIG[server_name].get("ssh_probe_interval", 30.0)
+        self.tunnel: SSHTunnelForwarder | None = None
+        self.reconnect_count = 0
+        self._lock = threading.Lock()
+        self._monitor: threading.Thread | None = None
+
+    def start(self: Self) -> None:
+        with self._lock:
+            self._open()
+        if self._monitor is None:
+            self._monitor = threading.Thread(
+                target=self._monitor_loop,
+                name=f"ssh-tunnel-{self.server_name}",
+                daemon=True,
+            )
+            self._monitor.start()
+
+    def _open(self: Self) -> None:
+        if self.tunnel is not None:
+            try:
+                self.tunnel.stop()
+            except Exception:
+                logger.exception(f"Closing dead SSH tunnel {self.server_name=}")
+            self.reconnect_count += 1
+        logger.info(f"Start SSH tunnel to {self.server_name=}")
+        self.tunnel = open_ssh_tunnel(self.server_name)
+        self.tunnel.start()
+        logger.info(
+            f"Opened SSH Tunnel {self.server_name=} port={self.tunnel.local_bind_port}"
+        )
+
+    def is_healthy(self: Self) -> bool:
+        if self.tunnel is None or not self.tunnel.is_active:
+            return False
+        try:
+            self.tunnel.check_tunnels()
+        except Exception:
+            return False
+        return all(self.tunnel.tunnel_is_up.values())
+
+    def ensure_alive(self: Self) -> None:
+        """Reopen the tunnel if the health probe fails."""
+        if self.is_healthy():
+            return
+        with self._lock:
+            # Another thread may have reconnected while we waited on the lock
+            if not self.is_healthy():
+                logger.warning(f"SSH tunnel down, reconnecting {self.server_name=}")
+                self._open()
+
+    def local_address(self: Self) -> tuple[str, str]:
+        if self.tunnel is None:
+            self.start()
+        assert self.tunnel is not None
+        return "127.0.0.1", str(self.tunnel.local_bind_port)
+
+    def _monitor_loop(self: Self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.ensure_alive()
+            except Exception:
+                logger.exception(f"SSH tunnel reconnect failed {self.server_name=}")
+
+
+TUNNELS: dict[str, SSHTunnelManager] = {}
+
+
+def get_tunnel_manager(server_name: str) -> SSHTunnelManager:
+    """Process wide tunnel manager for server_name, started on first use."""
+    if server_name not in TUNNELS:
+        manager = SSHTunnelManager(server_name)
+        manager.start()
+        TUNNELS[server_name] = manager
+    return TUNNELS[server_name]
+
+
 def get_db_connection(server_name: str) -> PostgresCon:
     """Returns a PostgresCon class
     to use class run server.set_engine()
@@ -102,9 +314,6 @@ def get_postgres_server_ips(server_name: str) -> tuple[str, str]:
         db_port = str(5432)
     else:
         logger.info(f"Opening SSH tunnel to {server_name=}")
-        ssh_server = open_ssh_tunnel(server_name)
-        ssh_server.start()
-        db_port = str(ssh_server.local_bind_port)
-        db_ip = "127.0.0.1"
+        db_ip, db_port = get_tunnel_manager(server_name).local_address()
     logger.info(f"Connecting {db_ip=} {db_port=}")
     return db_ip, db_port
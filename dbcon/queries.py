@@ -1,16 +1,354 @@
+import contextlib
+import contextvars
+import datetime
+import functools
+import itertools
+import json
+import pathlib
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
 import pandas as pd
+from sqlalchemy import Engine, text
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
-from config import get_logger
-from dbcon.connections import get_db_connection
+from config import CONFIG, CONFIG_DIR, get_logger
+from dbcon.async_executor import AsyncQueryExecutor, asyncpg
+from dbcon.connections import (
+    PostgresCon,
+    adbc_postgres,
+    get_db_connection,
+    get_pool_settings,
+)
+from metrics import (
+    BYTES_BUCKETS,
+    CURRENT_DATASET,
+    METRICS,
+    ROWS_BUCKETS,
+    QueryTimer,
+)
 
 logger = get_logger(__name__)
 
+# Server the crawler writes to, read only analytics can go to its replicas
+PRIMARY_SERVER = "madrone"
+
+FETCH_SQLALCHEMY = "sqlalchemy"
+FETCH_ARROW = "arrow"
+FETCH_ASYNC = "async"
+# Chunks from a server side cursor, see read_sql_chunks
+FETCH_STREAM = "stream"
+
+# Rows per chunk when streaming results to the dash tables
+STREAM_CHUNKSIZE = 200
+
+QUERY_THREADS = ThreadPoolExecutor(
+    max_workers=get_pool_settings(PRIMARY_SERVER)["pool_size"],
+    thread_name_prefix="query",
+)
+
+# Server wide default, individual queries can still opt into arrow
+DEFAULT_FETCH_ENGINE = CONFIG.get(PRIMARY_SERVER, {}).get(
+    "fetch_engine", FETCH_SQLALCHEMY
+)
+
+
+def _arrow_types_mapper(arrow_type: "pa.DataType") -> pd.StringDtype | None:
+    """Keep strings Arrow backed, numerics and dates convert to numpy columns."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def _numeric_to_float(table: "pa.Table") -> "pa.Table":
+    """Cast NUMERIC columns to float64, as pd.read_sql returns them.
+
+    The ADBC driver sends NUMERIC as strings tagged with the Postgres type
+    name in the field metadata, newer drivers may send decimals.
+    """
+    for i, field in enumerate(table.schema):
+        typname = (field.metadata or {}).get(b"ADBC:postgresql:typname")
+        if typname == b"numeric" or pa.types.is_decimal(field.type):
+            column = table.column(i).cast(pa.float64())
+            table = table.set_column(i, field.name, column)
+    return table
+
+
+# Same bind parameter syntax SQLAlchemy text() accepts, :name but not ::casts
+BIND_PARAM_RE = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+
+# Servers that answered the queries run inside a track_servers() block
+SERVERS_USED: contextvars.ContextVar[set[str] | None] = contextvars.ContextVar(
+    "servers_used", default=None
+)
+
+
+@contextlib.contextmanager
+def track_servers() -> Iterator[set[str]]:
+    """Collect the servers that answer the queries run inside the block."""
+    servers: set[str] = set()
+    token = SERVERS_USED.set(servers)
+    try:
+        yield servers
+    finally:
+        SERVERS_USED.reset(token)
+
+
+def to_numbered_params(sel_query: str, params: dict) -> tuple[str, tuple]:
+    """Rewrite :name bind parameters to $1 style for the ADBC driver."""
+    names: list[str] = []
+
+    def number_param(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    numbered_query = BIND_PARAM_RE.sub(number_param, sel_query)
+    return numbered_query, tuple(params[name] for name in names)
+
+
+def record_query(
+    timer: QueryTimer,
+    df: pd.DataFrame,
+    params: dict | None,
+    fetch_engine: str,
+    server_name: str = PRIMARY_SERVER,
+) -> None:
+    """Report phase timings, row count and memory size for one query."""
+    nbytes = int(df.memory_usage(deep=True).sum())
+    record_query_size(timer, len(df), nbytes, params, fetch_engine, server_name)
+
+
+def record_query_size(
+    timer: QueryTimer,
+    rows: int,
+    nbytes: int,
+    params: dict | None,
+    fetch_engine: str,
+    server_name: str,
+) -> None:
+    """Like record_query, for results that were never one DataFrame."""
+    dataset = CURRENT_DATASET.get()
+    servers = SERVERS_USED.get()
+    if servers is not None:
+        servers.add(server_name)
+    for phase, seconds in timer.phases.items():
+        METRICS.observe(f"query_{phase}_seconds", seconds, dataset=dataset)
+    METRICS.observe("query_seconds", timer.total, dataset=dataset)
+    METRICS.observe("query_rows", rows, buckets=ROWS_BUCKETS, dataset=dataset)
+    METRICS.observe("query_bytes", nbytes, buckets=BYTES_BUCKETS, dataset=dataset)
+    phases = {phase: round(seconds, 4) for phase, seconds in timer.phases.items()}
+    METRICS.add_recent(
+        {
+            "at": time.time(),
+            "dataset": dataset,
+            "params": params,
+            "fetch_engine": fetch_engine,
+            "server": server_name,
+            "seconds": timer.total,
+            "rows": rows,
+            "bytes": nbytes,
+            **phases,
+        }
+    )
+    logger.info(
+        f"Query {dataset=} {server_name=} {fetch_engine=} {params=} rows={rows} {nbytes=} "
+        f"seconds={timer.total:.3f} {phases=}"
+    )
+
+
+def read_sql_arrow(
+    sel_query: str,
+    params: dict | None = None,
+    timer: QueryTimer | None = None,
+    server_name: str = PRIMARY_SERVER,
+) -> pd.DataFrame:
+    """Fetch a query as an Arrow table and convert column by column to pandas.
+
+    This skips building Python row tuples, which dominates pd.read_sql
+    time and memory for wide result sets.
+    """
+    timer = timer or QueryTimer()
+    numbered_query, values = to_numbered_params(sel_query, params or {})
+    conn = get_dbcon(server_name).get_arrow_connection()
+    with conn.cursor() as cur:
+        cur.execute(numbered_query, values or None)
+        timer.mark("execute")
+        table = cur.fetch_arrow_table()
+        timer.mark("fetch")
+    table = _numeric_to_float(table)
+    df: pd.DataFrame = table.to_pandas(types_mapper=_arrow_types_mapper)
+    timer.mark("build")
+    return df
+
+
+def read_sql_async(
+    sel_query: str,
+    params: dict | None = None,
+    timer: QueryTimer | None = None,
+    server_name: str = PRIMARY_SERVER,
+) -> pd.DataFrame:
+    """Run a query on the worker's asyncpg event loop and wait for the frame.
+
+    Execution, fetch and build all happen on the loop, so they are
+    reported together as the fetch phase.
+    """
+    timer = timer or QueryTimer()
+    numbered_query, values = to_numbered_params(sel_query, params or {})
+    df = get_async_executor(server_name).run(numbered_query, values)
+    timer.mark("fetch")
+    return df
+
+
+def read_sql(
+    sel_query: str,
+    params: dict | None = None,
+    fetch_engine: str | None = None,
+    read_only: bool = False,
+) -> pd.DataFrame:
+    """Run sel_query with bound params and return a DataFrame.
+
+    All queries go through here so Postgres sees one statement text per
+    query and psycopg can reuse its server side prepared plan on each
+    pooled connection. Values are always passed as :name params, never
+    formatted into the SQL.
+
+    fetch_engine is 'sqlalchemy' (pd.read_sql), 'arrow' (ADBC) or 'async'
+    (asyncpg). Arrow and async fall back to pd.read_sql when their driver
+    is missing or the fetch fails.
+
+    read_only queries are routed to a healthy replica when replicas are
+    configured, and retried on the primary if the replica fails.
+    """
+    if fetch_engine is None:
+        fetch_engine = DEFAULT_FETCH_ENGINE
+    server_name = PRIMARY_SERVER
+    if read_only:
+        server_name = REPLICA_ROUTER.choose()
+    try:
+        return read_sql_on_server(server_name, sel_query, params, fetch_engine)
+    except Exception:
+        if server_name == PRIMARY_SERVER:
+            raise
+        logger.exception(f"Replica {server_name=} failed, retrying on primary")
+        REPLICA_ROUTER.mark_failed(server_name)
+        return read_sql_on_server(PRIMARY_SERVER, sel_query, params, fetch_engine)
+
+
+def read_sql_on_server(
+    server_name: str, sel_query: str, params: dict | None, fetch_engine: str
+) -> pd.DataFrame:
+    if fetch_engine == FETCH_ARROW and adbc_postgres is not None and pa is not None:
+        try:
+            timer = QueryTimer()
+            df = read_sql_arrow(sel_query, params, timer, server_name)
+            record_query(timer, df, params, fetch_engine, server_name)
+            return df
+        except Exception:
+            logger.exception("Arrow fetch failed, falling back to pd.read_sql")
+    if fetch_engine == FETCH_ASYNC and asyncpg is not None:
+        try:
+            timer = QueryTimer()
+            df = read_sql_async(sel_query, params, timer, server_name)
+            record_query(timer, df, params, fetch_engine, server_name)
+            return df
+        except Exception:
+            logger.exception("Async fetch failed, falling back to pd.read_sql")
+    timer = QueryTimer()
+    with get_engine(server_name).connect() as conn:
+        result = conn.execute(text(sel_query), params or {})
+        timer.mark("execute")
+        rows = result.fetchall()
+        timer.mark("fetch")
+        # Same construction as pd.read_sql, Decimals become floats
+        df = pd.DataFrame.from_records(
+            rows, columns=list(result.keys()), coerce_float=True
+        )
+        timer.mark("build")
+    record_query(timer, df, params, FETCH_SQLALCHEMY, server_name)
+    return df
+
+
+def read_sql_chunks(
+    sel_query: str,
+    params: dict | None = None,
+    chunksize: int = STREAM_CHUNKSIZE,
+    read_only: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks read from a server side cursor.
+
+    The connection is held until the generator is exhausted or closed.
+    """
+    server_name = REPLICA_ROUTER.choose() if read_only else PRIMARY_SERVER
+    streaming_engine = get_engine(server_name).execution_options(
+        stream_results=True, max_row_buffer=chunksize
+    )
+    timer = QueryTimer()
+    rows = 0
+    nbytes = 0
+    try:
+        with streaming_engine.connect() as conn:
+            for chunk in pd.read_sql(
+                text(sel_query), conn, params=params, chunksize=chunksize
+            ):
+                # The first chunk's wait is the query, later ones the fetch
+                timer.mark("fetch" if rows else "execute")
+                rows += len(chunk)
+                nbytes += int(chunk.memory_usage(deep=True).sum())
+                yield chunk
+                # Time the consumer spends on a chunk is not the query's
+                timer.skip()
+    finally:
+        record_query_size(timer, rows, nbytes, params, FETCH_STREAM, server_name)
+
+
+def run_concurrently(calls: Mapping[str, Callable[[], Any]]) -> dict[str, Any]:
+    """Run independent calls on the query thread pool and wait for all.
+
+    Latency is the slowest call instead of the sum of all of them. The
+    thread pool is no larger than the connection pool.
+    """
+    # Copy the context so queries in pool threads keep their dataset tag
+    futures = {
+        name: QUERY_THREADS.submit(contextvars.copy_context().run, call)
+        for name, call in calls.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def read_sql_many(
+    query_specs: dict[str, tuple[str, dict | None]],
+) -> dict[str, pd.DataFrame]:
+    """Run several (sel_query, params) specs concurrently, keyed by name."""
+    calls = {
+        name: functools.partial(read_sql, sel_query, params)
+        for name, (sel_query, params) in query_specs.items()
+    }
+    return run_concurrently(calls)
+
+
+def check_table_name(table_name: str) -> str:
+    """Table names can not be bound, only allow known tables with timestamps."""
+    if table_name not in DB_METADATA.tables_with_times:
+        raise ValueError(f"Unknown table {table_name=}")
+    return table_name
+
 
 def get_dash_users() -> dict:
     sel_query = """SELECT *
                     FROM dash.users
                     ;"""
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query)
     users_dict: dict = df.set_index("username").to_dict(orient="index")
     return users_dict
 
@@ -20,7 +358,7 @@ def get_app_categories() -> list[str]:
                     FROM networks_with_app_metrics
                     ;
                     """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query)
     category_list: list[str] = df["category"].tolist()
     category_list.sort()
     return category_list
@@ -34,7 +372,7 @@ def query_networks_with_app_metrics() -> pd.DataFrame:
                     {table_name}
                     ;
                 """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query)
     df = df.rename(
         columns={
             "publisher_urls": "publishers_count",
@@ -55,12 +393,12 @@ def query_networks_count(top_only: bool = False) -> pd.DataFrame:
                     {table_name}
                     ;
                 """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query, read_only=True)
     return df
 
 
 def query_network_uniqueness(limit: int = 100) -> pd.DataFrame:
-    sel_query = f"""
+    sel_query = """
         SELECT
         ad_domain_url,
         count(DISTINCT publisher_id) AS publisher_count,
@@ -70,15 +408,15 @@ def query_network_uniqueness(limit: int = 100) -> pd.DataFrame:
     GROUP BY
         ad_domain_url
     ORDER BY publisher_count DESC
-    LIMIT {limit}
+    LIMIT :limit
     ;
     """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query, params={"limit": limit}, read_only=True)
     df["percent"] = df["unique_count"] / df["publisher_count"]
     return df
 
 
-def get_app_txt_view(developer_url: str, direct_only: bool = True) -> pd.DataFrame:
+def _app_txt_view_query(direct_only: bool = True) -> str:
     if direct_only:
         direct_only_str = "AND av.relationship = 'DIRECT'"
     else:
@@ -92,7 +430,7 @@ def get_app_txt_view(developer_url: str, direct_only: bool = True) -> pd.DataFra
             FROM
                 app_ads_view av
             WHERE
-                av.developer_domain_url LIKE '{developer_url}'
+                av.developer_domain_url LIKE :developer_url
                 {direct_only_str}
                 )
             SELECT
@@ -115,13 +453,29 @@ def get_app_txt_view(developer_url: str, direct_only: bool = True) -> pd.DataFra
                 AND av2.publisher_id = c1.publisher_id
                     ;
                 """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    return sel_query
+
+
+def get_app_txt_view(developer_url: str, direct_only: bool = True) -> pd.DataFrame:
+    sel_query = _app_txt_view_query(direct_only=direct_only)
+    params = {"developer_url": developer_url}
+    df = read_sql(sel_query, params=params, fetch_engine=FETCH_ARROW, read_only=True)
     return df
 
 
+def stream_app_txt_view(
+    developer_url: str, direct_only: bool = True, chunksize: int = STREAM_CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    sel_query = _app_txt_view_query(direct_only=direct_only)
+    params = {"developer_url": developer_url}
+    yield from read_sql_chunks(
+        sel_query, params=params, chunksize=chunksize, read_only=True
+    )
+
+
 def query_store_apps_overview(start_date: str) -> pd.DataFrame:
     logger.info("Query logging.store_apps_snapshot")
-    sel_query = f"""SELECT
+    sel_query = """SELECT
                         sas.*,
                         s.name AS store_name,
                         coalesce(cr.outcome, 'not_crawled') AS outcome
@@ -131,34 +485,38 @@ def query_store_apps_overview(start_date: str) -> pd.DataFrame:
                         ON cr.id = sas.crawl_result
                     LEFT JOIN stores s
                         ON s.id = sas.store
-                    where updated_at >= '{start_date}'
+                    where updated_at >= CAST(:start_date AS DATE)
                     ;
                 """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    df = read_sql(
+        sel_query, params={"start_date": start_date}, fetch_engine=FETCH_ARROW
+    )
     df = df.drop(["store", "crawl_result"], axis=1)
     return df
 
 
 def query_pub_domains_overview(start_date: str) -> pd.DataFrame:
     logger.info("Query logging.pub_domains_snapshot")
-    sel_query = f"""SELECT
+    sel_query = """SELECT
                         ss.*,
                         coalesce(cr.outcome, 'not_crawled') AS outcome
                     FROM
                     logging.snapshot_pub_domains ss
                     LEFT JOIN crawl_results cr
                         ON cr.id = ss.crawl_result
-                    where updated_at >= '{start_date}'
+                    where updated_at >= CAST(:start_date AS DATE)
                     ;
                 """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    df = read_sql(
+        sel_query, params={"start_date": start_date}, fetch_engine=FETCH_ARROW
+    )
     df = df.drop(["crawl_result"], axis=1)
     return df
 
 
 def query_app_store_sources(start_date: str = "2021-01-01") -> pd.DataFrame:
     logger.info(f"Query app_store sources: table_name=app_store_sources {start_date=}")
-    sel_query = f"""SELECT 
+    sel_query = """SELECT 
                         date,
                         store,
                         COALESCE(crawl_source, 'unknown') AS crawl_source,
@@ -166,70 +524,74 @@ def query_app_store_sources(start_date: str = "2021-01-01") -> pd.DataFrame:
                     FROM 
                         store_apps_created_at
                     WHERE
-                        date >= '{start_date}'
+                        date >= CAST(:start_date AS DATE)
                     ;
                     """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    df = read_sql(sel_query, params={"start_date": start_date})
     df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
     df["store"] = df["store"].replace({1: "Google Play", 2: "Apple App Store"})
     return df
 
 
+# Run with the count queries, the spine ends on the database's date as the
+# CURRENT_DATE series it replaced did, not on the app server's
+DB_TODAY_QUERY = "SELECT CURRENT_DATE AS date;"
+
+
+def make_date_spine(
+    start_date: str, end_date: datetime.date, stores: list[int] | None = None
+) -> pd.DataFrame:
+    """Every day from start_date to end_date, newest first, optionally per store."""
+    dates = pd.date_range(start_date, end_date, freq="D").date[::-1]
+    df = pd.DataFrame({"date": dates})
+    if stores:
+        df = pd.DataFrame({"store": stores}).merge(df, how="cross")
+        df = df.sort_values(["date", "store"], ascending=[False, True])
+        df = df.reset_index(drop=True)
+    return df
+
+
 def query_developer_updated_timestamps(start_date: str = "2021-01-01") -> pd.DataFrame:
     logger.info(f"Query updated times: table_name=developers {start_date=}")
-    sel_query = f"""WITH my_dates AS (
-                    SELECT
-                        store,
-                        generate_series('{start_date}', 
-                            CURRENT_DATE, '1 day'::INTERVAL)::date AS date
-                    FROM generate_series(1, 2, 1) AS num_series(store)
-                    ),
-                    updated_dates AS (
-                    SELECT
+    updated_query = """SELECT
                         store,
-                        dca.apps_crawled_at::date AS crawled_date,
+                        dca.apps_crawled_at::date AS date,
                         count(1) AS devs_crawled_count
                     FROM
                         developers d
                     LEFT JOIN logging.developers_crawled_at dca
                         ON dca.developer = d.id
                     WHERE
-                        dca.apps_crawled_at >= '{start_date}'
+                        dca.apps_crawled_at >= CAST(:start_date AS DATE)
                     GROUP BY
                         store,
                         dca.apps_crawled_at::date
-                    ),
-                    created_dates AS (
-                    SELECT
+                    ;
+                """
+    created_query = """SELECT
                         store,
-                        created_at::date AS created_date,
+                        created_at::date AS date,
                         count(1) AS created_count
                     FROM
                         developers
                     WHERE
-                        created_at >= '{start_date}'
+                        created_at >= CAST(:start_date AS DATE)
                     GROUP BY
                         store,
                         created_at::date
-                        )
-                    SELECT
-                        my_dates.store AS store,
-                        my_dates.date AS date,
-                        updated_dates.devs_crawled_count,
-                        created_dates.created_count
-                    FROM
-                        my_dates
-                    LEFT JOIN updated_dates ON
-                        my_dates.date = updated_dates.crawled_date 
-                            AND my_dates.store = updated_dates.store
-                    LEFT JOIN created_dates ON
-                        my_dates.date = created_dates.created_date
-                            AND my_dates.store = created_dates.store
-                    ORDER BY
-                        my_dates.date DESC
                     ;
                 """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    params = {"start_date": start_date}
+    frames = read_sql_many(
+        {
+            "updated": (updated_query, params),
+            "created": (created_query, params),
+            "today": (DB_TODAY_QUERY, None),
+        }
+    )
+    df = make_date_spine(start_date, frames["today"]["date"].iloc[0], stores=[1, 2])
+    df = df.merge(frames["updated"], on=["store", "date"], how="left")
+    df = df.merge(frames["created"], on=["store", "date"], how="left")
     df = df.fillna(0)
     df["store"] = df["store"].replace({1: "Google Play", 2: "Apple App Store"})
     return df
@@ -237,7 +599,7 @@ def query_developer_updated_timestamps(start_date: str = "2021-01-01") -> pd.Dat
 
 def query_app_updated_timestamps(start_date: str) -> pd.DataFrame:
     logger.info(f"Query store app updated ats: {start_date=}")
-    sel_query = f"""WITH created_counts AS (
+    sel_query = """WITH created_counts AS (
                     SELECT
                         cr.store,
                         cr.date,
@@ -245,7 +607,7 @@ def query_app_updated_timestamps(start_date: str) -> pd.DataFrame:
                     FROM
                         store_apps_created_at cr
                     WHERE
-                        date >= '{start_date}'
+                        date >= CAST(:start_date AS DATE)
                     GROUP BY
                         cr.store,
                         cr.date
@@ -262,23 +624,23 @@ def query_app_updated_timestamps(start_date: str) -> pd.DataFrame:
                     cr.date = ua.date
                     AND ua.store = cr.store
                 WHERE
-                    ua.date >= '{start_date}'
+                    ua.date >= CAST(:start_date AS DATE)
                 ;
     """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    df = read_sql(sel_query, params={"start_date": start_date})
     df = df.fillna(0)
     df["store"] = df["store"].replace({1: "Google Play", 2: "Apple App Store"})
     return df
 
 
 def query_updated_version_code_timestamps(start_date: str) -> pd.DataFrame:
-    sel_query = f"""WITH my_dates AS
+    sel_query = """WITH my_dates AS
                         (
                             SELECT
                                 store,
                                 crawl_result,
                                 generate_series(
-                                    '{start_date}',
+                                    CAST(:start_date AS DATE),
                                     CURRENT_DATE,
                                     '1 day'::INTERVAL
                                 )::date AS date
@@ -305,7 +667,7 @@ def query_updated_version_code_timestamps(start_date: str) -> pd.DataFrame:
                             LEFT JOIN store_apps sa ON
                                 vc.store_app = sa.id
                             WHERE
-                                vc.updated_at >= '{start_date}'
+                                vc.updated_at >= CAST(:start_date AS DATE)
                             GROUP BY
                                 vc.updated_at::date,
                                 sa.store,
@@ -362,7 +724,7 @@ def query_updated_version_code_timestamps(start_date: str) -> pd.DataFrame:
                             my_dates.date DESC
                         ;
                 """
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    df = read_sql(sel_query, params={"start_date": start_date})
     df = df.fillna(0)
     df["store"] = df["store"].replace({1: "Google Play", 2: "Apple App Store"})
     df["crawl_result"] = df["crawl_result"].replace(
@@ -374,58 +736,50 @@ def query_updated_version_code_timestamps(start_date: str) -> pd.DataFrame:
 def query_updated_timestamps(
     table_name: str, start_date: str = "2021-01-01"
 ) -> pd.DataFrame:
+    table_name = check_table_name(table_name)
     created_column = "created_at"
     if table_name == "version_codes":
         created_column = "updated_at"  # no created_at column
     logger.info(f"Query updated times: {table_name=}")
-    sel_query = f"""WITH my_dates AS (
-                    SELECT
-                        generate_series('{start_date}', 
-                            CURRENT_DATE, '1 day'::INTERVAL)::date AS date),
-                    updated_dates AS (
-                    SELECT
-                        updated_at::date AS last_updated_date,
+    updated_query = f"""SELECT
+                        updated_at::date AS date,
                         count(1) AS last_updated_count
                     FROM
                         {table_name}
                     WHERE
-                        updated_at >= '{start_date}'
+                        updated_at >= CAST(:start_date AS DATE)
                     GROUP BY
-                        updated_at::date),
-                    created_dates AS (
-                    SELECT
-                        {created_column}::date AS created_date,
+                        updated_at::date
+                    ;
+                """
+    created_query = f"""SELECT
+                        {created_column}::date AS date,
                         count(1) AS created_count
                     FROM
                         {table_name}
                     WHERE
-                        {created_column} >= '{start_date}'
+                        {created_column} >= CAST(:start_date AS DATE)
                     GROUP BY
-                        {created_column}::date)
-                    SELECT
-                        my_dates.date AS date,
-                        updated_dates.last_updated_count,
-                        created_dates.created_count
-                    FROM
-                        my_dates
-                    LEFT JOIN updated_dates ON
-                        my_dates.date = updated_dates.last_updated_date
-                    LEFT JOIN created_dates ON
-                        my_dates.date = created_dates.created_date
-                    ORDER BY
-                        my_dates.date DESC
+                        {created_column}::date
                     ;
                 """
-    print(sel_query)
-    df = pd.read_sql(sel_query, con=DBCON.engine)
+    params = {"start_date": start_date}
+    frames = read_sql_many(
+        {
+            "updated": (updated_query, params),
+            "created": (created_query, params),
+            "today": (DB_TODAY_QUERY, None),
+        }
+    )
+    df = make_date_spine(start_date, frames["today"]["date"].iloc[0])
+    df = df.merge(frames["updated"], on="date", how="left")
+    df = df.merge(frames["created"], on="date", how="left")
     df = df.fillna(0)
     return df
 
 
-def query_search_developers(search_input: str, limit: int = 1000) -> pd.DataFrame:
-    logger.info(f"Developer search: {search_input=}")
-    search_input = f"%%{search_input}%%"
-    sel_query = f"""SELECT
+def _search_developers_query() -> str:
+    sel_query = """SELECT
                         d.*,
                         pd.*,
                         sa.*
@@ -438,51 +792,95 @@ def query_search_developers(search_input: str, limit: int = 1000) -> pd.DataFram
                     LEFT JOIN developers d ON
                         d.id = sa.developer
                     WHERE
-                        d.name ILIKE '{search_input}'
-                        OR d.developer_id ILIKE '{search_input}'
-                        OR pd.url ILIKE '{search_input}'
-                    LIMIT {limit}
+                        d.name ILIKE :search_input
+                        OR d.developer_id ILIKE :search_input
+                        OR pd.url ILIKE :search_input
+                    LIMIT :limit
                     ;
                     """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    return sel_query
+
+
+def query_search_developers(search_input: str, limit: int = 1000) -> pd.DataFrame:
+    logger.info(f"Developer search: {search_input=}")
+    sel_query = _search_developers_query()
+    params = {"search_input": f"%{search_input}%", "limit": limit}
+    df = read_sql(sel_query, params=params, read_only=True)
     return df
 
 
+def stream_search_developers(
+    search_input: str, limit: int = 1000, chunksize: int = STREAM_CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    logger.info(f"Developer search stream: {search_input=}")
+    sel_query = _search_developers_query()
+    params = {"search_input": f"%{search_input}%", "limit": limit}
+    yield from read_sql_chunks(
+        sel_query, params=params, chunksize=chunksize, read_only=True
+    )
+
+
 def get_all_tables_in_schema(schema_name: str) -> list[str]:
     logger.info("Get checks tables")
-    sel_schema = f"""SELECT table_name
+    sel_schema = """SELECT table_name
     FROM information_schema.tables
-    WHERE table_schema = '{schema_name}'
+    WHERE table_schema = :schema_name
     ;"""
-    tables_df = pd.read_sql(sel_schema, DBCON.engine)
+    tables_df = read_sql(sel_schema, params={"schema_name": schema_name})
     tables: list[str] = tables_df["table_name"].to_numpy().tolist()
     return tables
 
 
 def get_schema_overview(schema_name: str = "public") -> pd.DataFrame:
-    sel_query = f"""SELECT
+    sel_query = """SELECT
                         table_schema,
                         table_name,
                         column_name
                     FROM
                         information_schema.columns
                     WHERE
-                        table_schema ='{schema_name}'
+                        table_schema = :schema_name
                     ORDER BY
                         table_schema,
                         table_name
                 ;
                 """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query, params={"schema_name": schema_name})
     return df
 
 
+def query_source_versions(relations: list[str]) -> dict[str, str]:
+    """Change marker for each schema.table in relations found in pg statistics.
+
+    Inserts, updates and deletes move the tuple counters and a non concurrent
+    REFRESH MATERIALIZED VIEW swaps the relation's filenode. Statistics are
+    per server so this always runs on the primary.
+    """
+    sel_query = """SELECT
+                        schemaname || '.' || relname AS relation,
+                        pg_relation_filenode(relid) AS filenode,
+                        n_tup_ins + n_tup_upd + n_tup_del AS changes
+                    FROM
+                        pg_stat_user_tables
+                    WHERE
+                        schemaname || '.' || relname = ANY(:relations)
+                    ;
+                """
+    df = read_sql(
+        sel_query, params={"relations": relations}, fetch_engine=FETCH_SQLALCHEMY
+    )
+    versions = {
+        row.relation: f"{row.filenode}:{row.changes}" for row in df.itertuples()
+    }
+    return versions
+
+
 def get_appstore_categories() -> pd.DataFrame:
     sel_query = """SELECT *
                     FROM mv_app_categories
                     ;
                     """
-    df = pd.read_sql(sel_query, DBCON.engine)
+    df = read_sql(sel_query)
     df["store"] = df["store"].replace({1: "android", 2: "ios"})
     df = pd.pivot_table(
         data=df, index="category", values="app_count", columns="store", fill_value=0
@@ -493,21 +891,250 @@ def get_appstore_categories() -> pd.DataFrame:
     return df
 
 
-try:
-    logger.info("set db engine")
-    DBCON = get_db_connection("madrone")
-    DBCON.set_engine()
-    SCHEMA_OVERVIEW = get_schema_overview("public")
-    TABLES = SCHEMA_OVERVIEW["table_name"].unique().tolist()
-    APP_CATEGORIES = get_app_categories()
-    TABLES_WITH_TIMES = (
-        SCHEMA_OVERVIEW[
-            SCHEMA_OVERVIEW["column_name"].isin(["updated_at", "created_at"])
-        ]["table_name"]
-        .unique()
-        .tolist()
-    )
-except Exception:
-    logger.exception("Database Connection failed!")
-    APP_CATEGORIES = ["cat1", "cat2"]
-    TABLES_WITH_TIMES = ["overview", "store_apps", "version_codes"]
+DB_CONNECTIONS: dict[str, PostgresCon] = {}
+DB_CONNECTIONS_LOCK = threading.Lock()
+
+
+def get_dbcon(server_name: str = PRIMARY_SERVER) -> PostgresCon:
+    """Connection to server_name, created (and SSH tunnel opened) on first use."""
+    if server_name not in DB_CONNECTIONS:
+        with DB_CONNECTIONS_LOCK:
+            if server_name not in DB_CONNECTIONS:
+                logger.info(f"set db engine {server_name=}")
+                dbcon = get_db_connection(server_name)
+                dbcon.set_engine()
+                DB_CONNECTIONS[server_name] = dbcon
+    return DB_CONNECTIONS[server_name]
+
+
+def report_pool_stats() -> None:
+    """Set connection pool gauges for every server connected so far."""
+    for server_name, dbcon in list(DB_CONNECTIONS.items()):
+        for stat, value in dbcon.get_pool_stats().items():
+            METRICS.set_gauge(f"db_pool_{stat}", value, server=server_name)
+
+
+def get_engine(server_name: str = PRIMARY_SERVER) -> Engine:
+    engine = get_dbcon(server_name).engine
+    if engine is None:
+        raise RuntimeError(f"No engine for {server_name=}, its setup failed")
+    return engine
+
+
+ASYNC_EXECUTORS: dict[str, AsyncQueryExecutor] = {}
+
+
+def get_async_executor(server_name: str = PRIMARY_SERVER) -> AsyncQueryExecutor:
+    """One event loop and asyncpg pool per server for this worker."""
+    if server_name not in ASYNC_EXECUTORS:
+        dbcon = get_dbcon(server_name)
+        with DB_CONNECTIONS_LOCK:
+            if server_name not in ASYNC_EXECUTORS:
+                ASYNC_EXECUTORS[server_name] = AsyncQueryExecutor(dbcon)
+    return ASYNC_EXECUTORS[server_name]
+
+
+class ReplicaRouter:
+    """Spreads read only queries over the primary's replicas.
+
+    A background thread measures each replica's replay lag every
+    probe_interval seconds. Replicas that are down or lag more than
+    max_lag_seconds are skipped, healthy ones are used round robin and
+    the primary is used when none are healthy.
+    """
+
+    LAG_QUERY = """SELECT
+                    CASE
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                        THEN 0
+                        ELSE EXTRACT(
+                            EPOCH FROM now() - pg_last_xact_replay_timestamp()
+                        )
+                    END AS lag_seconds
+                    ;
+                """
+
+    def __init__(
+        self,
+        primary: str,
+        replicas: list[str],
+        max_lag_seconds: float,
+        probe_interval: float,
+    ) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.probe_interval = probe_interval
+        # None means down or not probed yet
+        self.lag: dict[str, float | None] = {name: None for name in replicas}
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor: threading.Thread | None = None
+
+    def choose(self) -> str:
+        if not self.replicas:
+            return self.primary
+        if self._monitor is None:
+            self._start_monitor()
+        healthy = [
+            name
+            for name, lag in self.lag.items()
+            if lag is not None and lag <= self.max_lag_seconds
+        ]
+        if not healthy:
+            return self.primary
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def mark_failed(self, server_name: str) -> None:
+        """Stop routing to server_name until the next probe finds it healthy."""
+        self.lag[server_name] = None
+
+    def probe(self) -> None:
+        for name in self.replicas:
+            try:
+                with get_engine(name).connect() as conn:
+                    lag = conn.execute(text(self.LAG_QUERY)).scalar()
+                self.lag[name] = float(lag or 0)
+            except Exception:
+                logger.exception(f"Replica lag probe failed {name=}")
+                self.lag[name] = None
+            lag_seconds = self.lag[name]
+            if lag_seconds is None or lag_seconds > self.max_lag_seconds:
+                logger.warning(f"Replica skipped {name=} lag={lag_seconds}")
+
+    def _start_monitor(self) -> None:
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="replica-lag-probe", daemon=True
+            )
+            self._monitor.start()
+
+    def _monitor_loop(self) -> None:
+        while True:
+            self.probe()
+            time.sleep(self.probe_interval)
+
+
+REPLICA_ROUTER = ReplicaRouter(
+    primary=PRIMARY_SERVER,
+    replicas=CONFIG.get(PRIMARY_SERVER, {}).get("replicas", []),
+    max_lag_seconds=CONFIG.get(PRIMARY_SERVER, {}).get("replica_max_lag", 30),
+    probe_interval=CONFIG.get(PRIMARY_SERVER, {}).get("replica_probe_interval", 10),
+)
+
+
+class DbMetadata:
+    """Schema derived metadata, loaded on first use instead of at import.
+
+    A json snapshot in the config dir lets new workers serve metadata
+    without touching the database. Values older than ttl_seconds are
+    refreshed on a background thread while the old values keep serving.
+    """
+
+    FALLBACK = {
+        "app_categories": ["cat1", "cat2"],
+        "tables_with_times": ["overview", "store_apps", "version_codes"],
+    }
+
+    def __init__(self, snapshot_path: pathlib.Path, ttl_seconds: float) -> None:
+        self.snapshot_path = snapshot_path
+        self.ttl_seconds = ttl_seconds
+        self._data: dict[str, list[str]] | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def app_categories(self) -> list[str]:
+        categories: list[str] = self._get("app_categories")
+        return categories
+
+    @property
+    def tables_with_times(self) -> list[str]:
+        tables: list[str] = self._get("tables_with_times")
+        return tables
+
+    def _get(self, key: str) -> list[str]:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._first_load()
+        elif time.time() - self._loaded_at > self.ttl_seconds:
+            self._refresh_in_background()
+        assert self._data is not None
+        return self._data[key]
+
+    def _first_load(self) -> None:
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path) as f:
+                    snapshot = json.load(f)
+                self._data = snapshot["data"]
+                self._loaded_at = snapshot["loaded_at"]
+                logger.info(f"DB metadata loaded from {self.snapshot_path}")
+                return
+            except Exception:
+                logger.exception(
+                    f"DB metadata snapshot unreadable {self.snapshot_path}"
+                )
+        try:
+            self._load_from_db()
+        except Exception:
+            logger.exception("Database Connection failed!")
+            self._data = self.FALLBACK
+            # Retry on next access rather than waiting a full ttl
+            self._loaded_at = 0.0
+
+    def _load_from_db(self) -> None:
+        results = run_concurrently(
+            {
+                "schema_overview": functools.partial(get_schema_overview, "public"),
+                "app_categories": get_app_categories,
+            }
+        )
+        schema_overview = results["schema_overview"]
+        tables_with_times = (
+            schema_overview[
+                schema_overview["column_name"].isin(["updated_at", "created_at"])
+            ]["table_name"]
+            .unique()
+            .tolist()
+        )
+        data = {
+            "app_categories": results["app_categories"],
+            "tables_with_times": tables_with_times,
+        }
+        self._data = data
+        self._loaded_at = time.time()
+        try:
+            with open(self.snapshot_path, "w") as f:
+                json.dump({"data": data, "loaded_at": self._loaded_at}, f)
+        except OSError:
+            logger.exception(f"DB metadata snapshot not written {self.snapshot_path}")
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh() -> None:
+            try:
+                self._load_from_db()
+                logger.info("DB metadata refreshed")
+            except Exception:
+                logger.exception("DB metadata refresh failed")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(
+            target=refresh, name="db-metadata-refresh", daemon=True
+        ).start()
+
+
+DB_METADATA = DbMetadata(
+    snapshot_path=pathlib.Path(CONFIG_DIR, "db_metadata.json"),
+    ttl_seconds=CONFIG.get(PRIMARY_SERVER, {}).get("metadata_ttl", 3600),
+)
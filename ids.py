@@ -8,6 +8,7 @@ HOME_TAB = "home-about"
 
 # Analytics Tab IDs
 NETWORKS = "networks"
+NETWORKS_WITH_APP_METRICS = "networks-with-app-metrics"
 NETWORK_UNIQUES = "network-uniques"
 DEVELOPERS_SEARCH = "developers-search"
 TXT_VIEW = "txt-view"
@@ -17,6 +18,7 @@ INTERNAL_LOGS = "internal-logs"
 STORE_APPS_HISTORY = "internal-overview"
 PUB_URLS_HISTORY = "pub-urls"
 APP_SOURCES = "dev-sources"
+CACHE_STATS = "cache-stats"
 
 # Tab Options
 AFFIX_DATE_PICKER = "-date-picker"
@@ -30,6 +32,7 @@ AFFIX_BUTTON = "-button"
 AFFIX_SEARCH = "-search"
 AFFIX_LOADING = "-loading"
 AFFIX_LEFT_MENU = "-left-menu"
+AFFIX_STREAM = "-stream"
 
 # Combined Components Names
 TXT_VIEW_TABLE = TXT_VIEW + AFFIX_TABLE
@@ -6,7 +6,7 @@ from dash import dcc, html
 from plotly import graph_objects as go
 
 from config import DATE_FORMAT, get_logger
-from dbcon.queries import APP_CATEGORIES, TABLES_WITH_TIMES
+from dbcon.queries import DB_METADATA
 from ids import (
     AFFIX_BUTTON,
     AFFIX_DATE_PICKER,
@@ -16,9 +16,11 @@ from ids import (
     AFFIX_LOADING,
     AFFIX_PLOT,
     AFFIX_RADIOS,
+    AFFIX_STREAM,
     AFFIX_SWITCHES,
     AFFIX_TABLE,
     APP_SOURCES,
+    CACHE_STATS,
     DEVELOPERS_SEARCH,
     HOME_TAB,
     INTERNAL_LOGS,
@@ -60,13 +62,29 @@ def make_main_content_list(page_id: str, tab_options) -> list:
     return main_content
 
 
+class TabLayouts(dict):
+    """Tab layouts built on first request, not at import.
+
+    Some layouts need database metadata, building them lazily keeps page
+    imports from waiting on the database.
+    """
+
+    def __init__(self, tab_tags: list[str]) -> None:
+        super().__init__()
+        self.tab_tags = tab_tags
+
+    def __missing__(self, tab_tag: str) -> html.Div:
+        if tab_tag not in self.tab_tags:
+            raise KeyError(tab_tag)
+        layout = create_tab_layout(tab_tag)
+        self[tab_tag] = layout
+        return layout
+
+
 def get_tab_layout_dict(page_id: str, tab_options: list[dict]) -> dict:
     tabs = make_tabs(page_id, tab_options=tab_options)
-    tab_layout = {}
     tab_tags = [x.tab_id for x in tabs.children]
-    for tab_tag in tab_tags:
-        default_layout = create_tab_layout(tab_tag)
-        tab_layout[tab_tag] = default_layout
+    tab_layout = TabLayouts(tab_tags)
     return tab_layout
 
 
@@ -176,6 +194,20 @@ def make_tab_options(tab_id: str) -> html.Div:
         )
     if INTERNAL_LOGS == tab_id:
         options_div = make_options_div(tab_id, date_picker=True)
+    if CACHE_STATS == tab_id:
+        radio_options = [
+            {
+                "label": "Datasets",
+                "value": "view_datasets",
+            },
+            {
+                "label": "Recent Queries",
+                "value": "view_queries",
+            },
+        ]
+        options_div = make_options_div(
+            tab_id, radio_options=radio_options, radio_title="View"
+        )
     if NETWORK_UNIQUES == tab_id:
         switch_options = [
             {
@@ -228,7 +260,8 @@ def make_tab_options(tab_id: str) -> html.Div:
             },
         ]
         groupby_options = [{"label": "All Categories", "value": "all_data"}] + [
-            {"label": x.replace("_", " ").title(), "value": x} for x in APP_CATEGORIES
+            {"label": x.replace("_", " ").title(), "value": x}
+            for x in DB_METADATA.app_categories
         ]
         groupby_defaults = "all_data"
         options_div = make_options_div(
@@ -303,7 +336,7 @@ def create_tab_layout(tab_id: str) -> html.Div:
     table_div = make_table_div(tab_id)
     plot_div = make_plot_div(tab_id)
     if tab_id == INTERNAL_LOGS:
-        tables = TABLES_WITH_TIMES
+        tables = DB_METADATA.tables_with_times
     else:
         tables = None
     buttons_div = get_left_buttons_layout(tab_id, tables=tables)
@@ -318,6 +351,11 @@ def create_tab_layout(tab_id: str) -> html.Div:
     tab_layout = html.Div(
         [
             dcc.Store(id=f"{tab_id}-memory-output", storage_type="memory"),
+            None
+            if tab_id not in STREAMED_TABS
+            else dcc.Interval(
+                id=tab_id + AFFIX_STREAM, interval=STREAM_POLL_MS, disabled=True
+            ),
             dbc.Row(  # Entire Page Row
                 [
                     None
@@ -615,6 +653,10 @@ def get_left_buttons_layout(
     return mydiv
 
 
+# Tabs whose tables render streamed rows while the query is still loading
+STREAMED_TABS = [DEVELOPERS_SEARCH, TXT_VIEW]
+STREAM_POLL_MS = 500
+
 TXT_VIEW_COLUMNS = [
     "my_domain_url",
     "their_domain_url",
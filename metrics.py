@@ -0,0 +1,158 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from typing import Self
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+ROWS_BUCKETS: list[float] = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+BYTES_BUCKETS = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9]
+
+# Dataset id of the get_cached_dataframe call a query runs for
+CURRENT_DATASET: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_dataset", default="untagged"
+)
+
+
+@contextlib.contextmanager
+def dataset_context(dataset_id: str) -> Iterator[None]:
+    """Tag every query run inside the block with dataset_id."""
+    token = CURRENT_DATASET.set(dataset_id)
+    try:
+        yield
+    finally:
+        CURRENT_DATASET.reset(token)
+
+
+class QueryTimer:
+    """Splits a query's wall time into named phases, eg execute, fetch, build."""
+
+    def __init__(self: Self) -> None:
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases: dict[str, float] = {}
+
+    def mark(self: Self, phase: str) -> None:
+        """Attribute the time since the previous mark to phase."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def skip(self: Self) -> None:
+        """Leave the time since the previous mark out of every phase."""
+        self.last = time.perf_counter()
+
+    @property
+    def total(self: Self) -> float:
+        return sum(self.phases.values())
+
+
+class Histogram:
+    def __init__(self: Self, buckets: list[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self: Self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In process histograms and counters, exported in Prometheus text format."""
+
+    def __init__(self: Self, recent_size: int = 200) -> None:
+        self._lock = threading.Lock()
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.gauges: dict[tuple[str, tuple], float] = {}
+        self.recent: deque[dict] = deque(maxlen=recent_size)
+
+    def observe(
+        self: Self,
+        name: str,
+        value: float,
+        buckets: list[float] = SECONDS_BUCKETS,
+        **labels: str,
+    ) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def inc(self: Self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self: Self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def counter_values(self: Self, name: str) -> dict[tuple, float]:
+        """Value of counter name per label set, eg (("dataset", "networks"),)."""
+        with self._lock:
+            return {
+                labels: value
+                for (counter, labels), value in self.counters.items()
+                if counter == name
+            }
+
+    def recent_events(self: Self) -> list[dict]:
+        with self._lock:
+            return list(self.recent)
+
+    def add_recent(self: Self, event: dict) -> None:
+        """Keep the latest events, eg individual queries, for inspection."""
+        with self._lock:
+            self.recent.append(event)
+
+    def to_prometheus(self: Self) -> str:
+        lines = []
+        with self._lock:
+            typed: set[str] = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} gauge")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bucket, count in zip(
+                    [*hist.buckets, "+Inf"], hist.counts, strict=True
+                ):
+                    cumulative += count
+                    bucket_labels = _format_labels((*labels, ("le", str(bucket))))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + label_str + "}"
+
+
+METRICS = MetricsRegistry()
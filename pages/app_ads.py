@@ -11,11 +11,13 @@ from ids import (
     AFFIX_LOADING,
     AFFIX_PLOT,
     AFFIX_RADIOS,
+    AFFIX_STREAM,
     AFFIX_SWITCHES,
     AFFIX_TABLE,
     DEVELOPERS_SEARCH,
     NETWORK_UNIQUES,
     NETWORKS,
+    NETWORKS_WITH_APP_METRICS,
     TXT_VIEW,
     TXT_VIEW_TABLE,
 )
@@ -26,8 +28,10 @@ from layout.tab_template import (
 )
 from plotter.plotter import horizontal_barchart, overview_plot, treemap
 from utils import (
+    ARTIFACTS,
     add_id_column,
     get_cached_dataframe,
+    get_streamed_dataframe,
     limit_rows_for_plotting,
     titlelize,
 )
@@ -65,14 +69,17 @@ def render_content(tab):
 @callback(
     Output(DEVELOPERS_SEARCH + AFFIX_TABLE, "rowData"),
     Output(DEVELOPERS_SEARCH + AFFIX_TABLE, "columnDefs"),
+    Output(DEVELOPERS_SEARCH + AFFIX_STREAM, "disabled"),
     Input(DEVELOPERS_SEARCH + AFFIX_BUTTON, "n_clicks"),
     State(DEVELOPERS_SEARCH + "-input", "value"),
     Input(DEVELOPERS_SEARCH + AFFIX_TABLE, "virtualRowData"),
+    Input(DEVELOPERS_SEARCH + AFFIX_STREAM, "n_intervals"),
 )
 def developers_search(
     button,
     input_value,
     virtual_row_data: list[str],
+    n_intervals,
 ):
     logger.info(f"Developers Search {input_value=}")
     metrics = ["size"]
@@ -83,13 +90,15 @@ def developers_search(
         "id": DEVELOPERS_SEARCH,
         "search_input": input_value,
     }
-    df = get_cached_dataframe(query_json=json.dumps(query_dict))
-    logger.info(f"Developers Search {df.shape=}")
+    df, done = get_streamed_dataframe(
+        query_json=json.dumps(query_dict),
+        retry=dash.ctx.triggered_id == DEVELOPERS_SEARCH + AFFIX_BUTTON,
+    )
+    logger.info(f"Developers Search {df.shape=} {done=}")
     dimensions = [x for x in df.columns if x not in metrics and x != "id"]
     column_dicts = make_columns(dimensions, metrics)
-    logger.info(f"Developers Search {df.shape=}")
     table_obj = df.to_dict("records")
-    return table_obj, column_dicts
+    return table_obj, column_dicts, done
 
 
 operators = [
@@ -164,6 +173,7 @@ def filter_table(dff, page_current, page_size, sort_by, myfilter):
     Output(TXT_VIEW_TABLE, "rowData"),
     Output(TXT_VIEW_TABLE, "columnDefs"),
     Output(TXT_VIEW + f"-search{AFFIX_LOADING}", "children"),
+    Output(TXT_VIEW + AFFIX_STREAM, "disabled"),
     Input(TXT_VIEW_TABLE, "page_current"),
     Input(TXT_VIEW_TABLE, "page_size"),
     Input(TXT_VIEW_TABLE, "sort_by"),
@@ -172,6 +182,7 @@ def filter_table(dff, page_current, page_size, sort_by, myfilter):
     State(TXT_VIEW + "-input", "value"),
     Input(TXT_VIEW + AFFIX_GROUPBY, "value"),
     Input(TXT_VIEW_TABLE, "virtualRowData"),
+    Input(TXT_VIEW + AFFIX_STREAM, "n_intervals"),
 )
 def txt_view_table(
     page_current,
@@ -182,17 +193,24 @@ def txt_view_table(
     developer_url,
     groupby,
     virtual_row_data: list[str],
+    n_intervals,
 ):
     logger.info(f"{TXT_VIEW} Table {developer_url=}")
     metrics = ["size"]
     if not developer_url:
         raise PreventUpdate
     query_dict = {"id": TXT_VIEW, "developer_url": developer_url}
-    df = get_cached_dataframe(query_json=json.dumps(query_dict))
-    logger.info(f"{TXT_VIEW} Table {developer_url=} {df.shape=}")
+    # Counts grow as rows stream in, the interval polls until loading is done
+    df, done = get_streamed_dataframe(
+        query_json=json.dumps(query_dict),
+        retry=dash.ctx.triggered_id == TXT_VIEW + AFFIX_BUTTON,
+    )
+    logger.info(f"{TXT_VIEW} Table {developer_url=} {df.shape=} {done=}")
+    if df.empty:
+        return [], [], "", done
     metrics = ["size"]
     df = (
-        df.groupby(groupby, dropna=False)
+        df.groupby(groupby, dropna=False, observed=True)
         .size()
         .reset_index()
         .rename(columns={0: "size"})
@@ -202,7 +220,7 @@ def txt_view_table(
     dimensions = [x for x in df.columns if x not in metrics and x != "id"]
     column_dicts = make_columns(dimensions, metrics)
     table_obj = df.to_dict("records")
-    return table_obj, column_dicts, ""
+    return table_obj, column_dicts, "", done
 
 
 @callback(
@@ -214,6 +232,7 @@ def txt_view_table(
     Input(NETWORKS + AFFIX_RADIOS, "value"),
     Input(NETWORKS + AFFIX_GROUPBY, "value"),
 )
+@ARTIFACTS.cached
 def networks_table(
     virtual_row_ids: list[str],
     switches: list[str],
@@ -232,7 +251,7 @@ def networks_table(
         cat_title = f"{category.replace('_', ' ').title()}"
         title = f"{cat_title} Marketshare of Programmatic Ad Networks"
         logger.info(f"Networks Dropdown is {category=}")
-        query_dict: dict = {"id": "networks-with-app-metrics"}
+        query_dict: dict = {"id": NETWORKS_WITH_APP_METRICS}
         df = get_cached_dataframe(query_json=json.dumps(query_dict))
         df = df[df["store"] == 1]
         df = df[df["category"] == category]
@@ -295,6 +314,7 @@ def networks_table(
     Input(NETWORK_UNIQUES + AFFIX_RADIOS, "value"),
     Input(NETWORK_UNIQUES + AFFIX_SWITCHES, "value"),
 )
+@ARTIFACTS.cached
 def network_uniques(virtual_row_data: list[str], radios, switches):
     logger.info(f"{NETWORK_UNIQUES} start")
     metrics = ["percent"]
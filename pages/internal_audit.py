@@ -4,17 +4,20 @@ import dash
 import pandas as pd
 from dash import Input, Output, callback
 from dash.exceptions import PreventUpdate
+from plotly import graph_objects as go
 
 from config import get_logger
-from dbcon.queries import TABLES_WITH_TIMES
+from dbcon.queries import DB_METADATA
 from ids import (
     AFFIX_DATE_PICKER,
     AFFIX_GROUPBY_TIME,
     AFFIX_LEFT_MENU,
     AFFIX_PLOT,
+    AFFIX_RADIOS,
     AFFIX_SWITCHES,
     AFFIX_TABLE,
     APP_SOURCES,
+    CACHE_STATS,
     INTERNAL_LOGS,
     PUB_URLS_HISTORY,
     STORE_APPS_HISTORY,
@@ -27,7 +30,9 @@ from layout.tab_template import (
 )
 from plotter.plotter import overview_plot
 from utils import (
+    ARTIFACTS,
     add_id_column,
+    get_cache_stats,
     get_cached_dataframe,
     get_earlier_date,
     limit_rows_for_plotting,
@@ -45,6 +50,7 @@ TAB_OPTIONS = [
     {"label": "Store Apps Historical", "tab_id": STORE_APPS_HISTORY},
     {"label": "Pub URLs Historical", "tab_id": PUB_URLS_HISTORY},
     {"label": "App Sources", "tab_id": APP_SOURCES},
+    {"label": "Dashboard Cache", "tab_id": CACHE_STATS},
 ]
 
 TABS_DICT = get_tab_layout_dict(page_id=PAGE_ID, tab_options=TAB_OPTIONS)
@@ -94,7 +100,7 @@ def internal_logs(n_clicks, start_date):
     df = add_id_column(df, dimensions=dimensions)
     column_dicts = make_columns(dimensions, metrics)
     buttons = get_left_buttons_layout(
-        INTERNAL_LOGS, active_x=table_name, tables=TABLES_WITH_TIMES
+        INTERNAL_LOGS, active_x=table_name, tables=DB_METADATA.tables_with_times
     )
     logger.info(f"Internal Logs: {table_name=} {df.shape=}")
     table_obj = df.to_dict("records")
@@ -107,6 +113,7 @@ def internal_logs(n_clicks, start_date):
     Input(INTERNAL_LOGS + "-memory-output", "data"),
     Input(INTERNAL_LOGS + AFFIX_TABLE, "virtualRowData"),
 )
+@ARTIFACTS.cached
 def internal_logs_plot(
     start_date: str,
     table_name: str,
@@ -154,6 +161,7 @@ def internal_logs_plot(
     Input(STORE_APPS_HISTORY + AFFIX_DATE_PICKER, "start_date"),
     Input(STORE_APPS_HISTORY + AFFIX_SWITCHES, "value"),
 )
+@ARTIFACTS.cached
 def store_apps_history(start_date: str, switches: list[str]):
     logger.info("Store apps historical data")
     metrics = ["total_rows", "avg_days", "max_days", "rows_older_than15"]
@@ -175,9 +183,18 @@ def store_apps_history(start_date: str, switches: list[str]):
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby([date_col] + dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = (
+        df.groupby([date_col] + dimensions, observed=True)[metrics]
+        .agg(metric_aggs)
+        .reset_index()
+    )
     # Take last time for overview
-    df = df.set_index(date_col).groupby(dimensions, dropna=False).last().reset_index()
+    df = (
+        df.set_index(date_col)
+        .groupby(dimensions, dropna=False, observed=True)
+        .last()
+        .reset_index()
+    )
     df = add_id_column(df, dimensions=dimensions)
     column_dicts = make_columns(dimensions, metrics)
     logger.info(f"Store apps history: {dimensions=} {df.shape=}")
@@ -192,6 +209,7 @@ def store_apps_history(start_date: str, switches: list[str]):
     Input(STORE_APPS_HISTORY + AFFIX_SWITCHES, "value"),
     Input(STORE_APPS_HISTORY + AFFIX_GROUPBY_TIME, "value"),
 )
+@ARTIFACTS.cached
 def store_apps_history_plot(
     start_date: str,
     virtual_row_ids: list[str],
@@ -208,7 +226,8 @@ def store_apps_history_plot(
         "id": STORE_APPS_HISTORY,
         "start_date": start_date,
     }
-    df = get_cached_dataframe(query_json=json.dumps(query_dict))
+    columns = [date_col, *switches] if switches else None
+    df = get_cached_dataframe(query_json=json.dumps(query_dict), columns=columns)
     dimensions = [x for x in df.columns if x not in metrics and x != date_col]
     if switches and len(switches) > 0:
         dimensions = [x for x in dimensions if x in switches]
@@ -221,11 +240,17 @@ def store_apps_history_plot(
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby([date_col] + dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = (
+        df.groupby([date_col] + dimensions, observed=True)[metrics]
+        .agg(metric_aggs)
+        .reset_index()
+    )
     # Limit Frequency for plotting to control number of points/columns
     df = (
         df.groupby(
-            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions, dropna=False
+            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions,
+            dropna=False,
+            observed=True,
         )
         .last()
         .reset_index()
@@ -251,6 +276,7 @@ def store_apps_history_plot(
     Input(PUB_URLS_HISTORY + AFFIX_DATE_PICKER, "start_date"),
     Input(PUB_URLS_HISTORY + AFFIX_SWITCHES, "value"),
 )
+@ARTIFACTS.cached
 def pub_domains_history(start_date: str, switches):
     logger.info("Store pub domains history data")
     metrics = ["total_rows", "avg_days", "max_days", "rows_older_than15"]
@@ -272,7 +298,11 @@ def pub_domains_history(start_date: str, switches):
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby([date_col] + dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = (
+        df.groupby([date_col] + dimensions, observed=True)[metrics]
+        .agg(metric_aggs)
+        .reset_index()
+    )
     # Take last time for overview
     # df = df.set_index(date_col).groupby.last().reset_index()
     df = add_id_column(df, dimensions=dimensions)
@@ -289,6 +319,7 @@ def pub_domains_history(start_date: str, switches):
     Input(PUB_URLS_HISTORY + AFFIX_SWITCHES, "value"),
     Input(PUB_URLS_HISTORY + AFFIX_GROUPBY_TIME, "value"),
 )
+@ARTIFACTS.cached
 def pub_domains_history_plot(
     start_date: str,
     virtual_row_ids: list[str],
@@ -305,7 +336,8 @@ def pub_domains_history_plot(
         "id": PUB_URLS_HISTORY,
         "start_date": start_date,
     }
-    df = get_cached_dataframe(query_json=json.dumps(query_dict))
+    columns = [date_col, *switches] if switches else None
+    df = get_cached_dataframe(query_json=json.dumps(query_dict), columns=columns)
     dimensions = [x for x in df.columns if x not in metrics and x != date_col]
     if switches and len(switches) > 0:
         dimensions = [x for x in dimensions if x in switches]
@@ -318,11 +350,17 @@ def pub_domains_history_plot(
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby([date_col] + dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = (
+        df.groupby([date_col] + dimensions, observed=True)[metrics]
+        .agg(metric_aggs)
+        .reset_index()
+    )
     # Limit Frequency for plotting to control number of points/columns
     df = (
         df.groupby(
-            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions, dropna=False
+            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions,
+            dropna=False,
+            observed=True,
         )
         .last()
         .reset_index()
@@ -348,6 +386,7 @@ def pub_domains_history_plot(
     Input(APP_SOURCES + AFFIX_DATE_PICKER, "start_date"),
     Input(APP_SOURCES + AFFIX_SWITCHES, "value"),
 )
+@ARTIFACTS.cached
 def app_sources(start_date: str, switches):
     logger.info("Store developer sources data")
     metrics = ["app_count"]
@@ -366,7 +405,7 @@ def app_sources(start_date: str, switches):
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby(dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = df.groupby(dimensions, observed=True)[metrics].agg(metric_aggs).reset_index()
     # Take last time for overview
     # df = df.set_index(date_col).groupby.last().reset_index()
     df = add_id_column(df, dimensions=dimensions)
@@ -383,6 +422,7 @@ def app_sources(start_date: str, switches):
     Input(APP_SOURCES + AFFIX_SWITCHES, "value"),
     Input(APP_SOURCES + AFFIX_GROUPBY_TIME, "value"),
 )
+@ARTIFACTS.cached
 def app_sources_plot(
     start_date: str,
     virtual_row_ids: list[str],
@@ -399,7 +439,8 @@ def app_sources_plot(
         "id": APP_SOURCES,
         "start_date": start_date,
     }
-    df = get_cached_dataframe(query_json=json.dumps(query_dict))
+    columns = [date_col, *switches] if switches else None
+    df = get_cached_dataframe(query_json=json.dumps(query_dict), columns=columns)
     dimensions = [x for x in df.columns if x not in metrics and x != date_col]
     if switches and len(switches) > 0:
         dimensions = [x for x in dimensions if x in switches]
@@ -409,11 +450,17 @@ def app_sources_plot(
         }
         metric_aggs = {k: v for k, v in agg_default.items() if k in metrics}
     # First agg across dimensions
-    df = df.groupby([date_col] + dimensions)[metrics].agg(metric_aggs).reset_index()
+    df = (
+        df.groupby([date_col] + dimensions, observed=True)[metrics]
+        .agg(metric_aggs)
+        .reset_index()
+    )
     # Limit Frequency for plotting to control number of points/columns
     df = (
         df.groupby(
-            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions, dropna=False
+            [pd.Grouper(key=date_col, freq=groupby_time)] + dimensions,
+            dropna=False,
+            observed=True,
         )
         .last()
         .reset_index()
@@ -431,3 +478,60 @@ def app_sources_plot(
         bar_column=bar_column,
     )
     return fig
+
+
+@callback(
+    Output(CACHE_STATS + AFFIX_TABLE, "rowData"),
+    Output(CACHE_STATS + AFFIX_TABLE, "columnDefs"),
+    Output(CACHE_STATS + AFFIX_PLOT, "figure"),
+    Input(CACHE_STATS + AFFIX_RADIOS, "value"),
+)
+def cache_stats(
+    radio_value: str,
+) -> tuple[list[dict], list[dict], go.Figure | dict]:
+    logger.info(f"Cache stats {radio_value=}")
+    datasets, queries, in_flight = get_cache_stats()
+    if radio_value == "view_queries":
+        dimensions = ["dataset", "params", "fetch_engine", "server", "at"]
+        metrics = ["seconds", "rows", "bytes"]
+        df = queries
+        xaxis_col = "at"
+        bar_column = "seconds"
+        title = f"Recent Queries, {len(in_flight)} loads in flight"
+    else:
+        dimensions = ["dataset"]
+        metrics = [
+            "hit_percent",
+            "hits_local",
+            "hits_shared",
+            "range_hits",
+            "misses",
+            "stale_served",
+            "coalesced",
+            "entries",
+            "mb",
+            "shared_entries",
+            "shared_mb",
+            "oldest_entry_minutes",
+            "workers",
+        ]
+        df = datasets
+        xaxis_col = "dataset"
+        bar_column = "hit_percent"
+        title = f"Dataset Cache Hits, in flight: {', '.join(in_flight) or 'none'}"
+    if df.empty:
+        return [], make_columns(dimensions, metrics), {}
+    dimensions = [x for x in dimensions if x in df.columns]
+    metrics = [x for x in metrics if x in df.columns]
+    df = add_id_column(df, dimensions=["dataset"])
+    column_dicts = make_columns(dimensions, metrics)
+    logger.info(f"Cache stats: {df.shape=} {len(in_flight)=}")
+    fig = overview_plot(
+        df=df.copy(),
+        xaxis_col=xaxis_col,
+        y_vals=[bar_column],
+        title=title,
+        bar_column=bar_column,
+    )
+    table_obj = df[dimensions + metrics].to_dict("records")
+    return table_obj, column_dicts, fig
@@ -80,6 +80,9 @@ def horizontal_barchart(
 def treemap(df, path: list[str], values: str | list[str], color: str, title: str):
     df = df.head(len(PASTELS))
     df = df.reset_index(drop=True)
+    # px.treemap takes the max of color, not defined for unordered categoricals
+    labels = [x for x in {*path, color} if isinstance(df[x].dtype, pd.CategoricalDtype)]
+    df = df.astype(dict.fromkeys(labels, object))
     color_dict = {row.ad_domain_url: PASTELS[i] for i, row in df.iterrows()}
     fig = px.treemap(
         df,
@@ -119,9 +122,17 @@ def overview_plot(
     if not bar_column:
         bar_column = guess_bar_column(df)
     if bar_column and bar_column in y_vals:
-        ordered_ids = df.groupby("id")[bar_column].sum().sort_values(ascending=False)
+        ordered_ids = (
+            df.groupby("id", observed=True)[bar_column]
+            .sum()
+            .sort_values(ascending=False)
+        )
     else:
-        ordered_ids = df.groupby("id")[y_vals[0]].size().sort_values(ascending=False)
+        ordered_ids = (
+            df.groupby("id", observed=True)[y_vals[0]]
+            .size()
+            .sort_values(ascending=False)
+        )
     df_ids = ordered_ids.index.unique().tolist()
     logger.info(f"my {df_ids=}")
     color_dims = force_color_dimensions or (len(df_ids) >= len(y_vals))
@@ -165,7 +176,7 @@ def overview_plot(
                     strict=False,
                 )
             )
-            df["color"] = df["id"].map(color_map).fillna(df["color"])
+            df["color"] = df["id"].map(color_map).astype(object).fillna(df["color"])
 
         # Set any remaining null colors to the last color in COLORS list
         df.loc[df.color.isna(), "color"] = COLORS[len(main_ids_color_cats)]
@@ -173,7 +184,7 @@ def overview_plot(
         cdf = df[["id", "color"]].drop_duplicates()
 
         pdf = pd.pivot_table(
-            df, index=[xaxis_col], columns="id", values=y_val
+            df, index=[xaxis_col], columns="id", values=y_val, observed=True
         ).reset_index()
         pdf = pdf.sort_values(xaxis_col)
         missing_plot_columns = [x for x in df_ids if x not in pdf.columns]
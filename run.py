@@ -1,23 +1,33 @@
-from functools import wraps
+from functools import cache, wraps
 
 from flask import Response, request
 
 from config import get_logger
 from dashapp import app as dashapp
-from dbcon.queries import get_dash_users
+from dbcon.queries import get_dash_users, report_pool_stats
+from metrics import METRICS
 from server import server
+from utils import CACHE, CACHE_WARM, CACHE_WARMER, WORKER_STATS
 
 logger = get_logger(__name__)
 
 
 logger.info(f"start, {dashapp=}")
 
-DASH_USERS_DICT = get_dash_users()
+if CACHE_WARM:
+    CACHE_WARMER.start()
+WORKER_STATS.start()
+
+
+@cache
+def get_dash_users_dict() -> dict:
+    """Loaded on the first login attempt so worker boot skips the database."""
+    return get_dash_users()
 
 
 def check_auth(username, password):
     try:
-        if password == DASH_USERS_DICT[username]["password"]:
+        if password == get_dash_users_dict()[username]["password"]:
             login = True
         else:
             login = False
@@ -54,5 +64,23 @@ def home():
     return "Welcome", 200
 
 
+@server.route("/admin/cache/clear", methods=["POST"])
+@requires_auth
+def clear_cache() -> Response:
+    """Drop every cached dataset, the cache is otherwise kept across restarts."""
+    generation = CACHE.clear()
+    return Response(f"Cache cleared, generation {generation}\n", 200)
+
+
+@server.route("/metrics")
+@requires_auth
+def metrics() -> Response:
+    """Query, dataset and pool metrics of this worker in Prometheus text format."""
+    report_pool_stats()
+    if CACHE.budget is not None:
+        CACHE.budget.report()
+    return Response(METRICS.to_prometheus(), 200, mimetype="text/plain")
+
+
 if __name__ == "__main__":
     server.run(host="0.0.0.0", port=5000, debug=True, ssl_context="adhoc")
@@ -1,13 +1,38 @@
 import datetime
+import functools
+import hashlib
+import inspect
 import json
+import pathlib
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from typing import Any
 
 import dash
+import numpy as np
 import pandas as pd
+from flask import Flask
 from flask_caching import Cache
 
-from config import DATE_FORMAT, get_logger
+from cache.artifacts import ArtifactCache, record_dependency
+from cache.budget import SharedBudget
+from cache.freshness import SourceFreshness
+from cache.locks import LOCK_PREFIX, CacheLocks, FileLocks, SharedLocks
+from cache.serializers import ARROW, FrameSerializer
+from cache.singleflight import SingleFlight
+from cache.stats import WorkerStats
+from cache.tiered import CacheEntry, CachePolicy, TieredCache, copy_value
+from cache.warming import CacheWarmer
+from config import CONFIG, DATE_FORMAT, get_logger
 from dbcon.queries import (
+    DB_METADATA,
+    PRIMARY_SERVER,
+    _app_txt_view_query,
+    _search_developers_query,
     get_app_txt_view,
+    make_date_spine,
     query_app_store_sources,
     query_app_updated_timestamps,
     query_developer_updated_timestamps,
@@ -16,9 +41,13 @@ from dbcon.queries import (
     query_networks_with_app_metrics,
     query_pub_domains_overview,
     query_search_developers,
+    query_source_versions,
     query_store_apps_overview,
     query_updated_timestamps,
     query_updated_version_code_timestamps,
+    stream_app_txt_view,
+    stream_search_developers,
+    track_servers,
 )
 from ids import (
     APP_SOURCES,
@@ -26,49 +55,639 @@ from ids import (
     INTERNAL_LOGS,
     NETWORK_UNIQUES,
     NETWORKS,
+    NETWORKS_WITH_APP_METRICS,
     PUB_URLS_HISTORY,
     STORE_APPS_HISTORY,
     TXT_VIEW,
 )
+from metrics import METRICS, QueryTimer, dataset_context
 
 logger = get_logger(__name__)
 
 logger.info("utils initialize cache")
 
-CACHE_CONFIG = {
-    "CACHE_TYPE": "filesystem",
+# Settings for the shared tier, a [cache] section in config.toml overrides
+# them, eg CACHE_TYPE = "RedisCache" and CACHE_REDIS_URL for several nodes
+CACHE_CONFIG: dict[str, Any] = {
+    "CACHE_TYPE": "FileSystemCache",
     "CACHE_DIR": "/tmp/appdash/",
-    # higher numbers will store more data in the filesystem
-    "CACHE_THRESHOLD": 50,
+    # Files cachelib keeps before pruning, a backstop, shared_max_mb bounds
+    # the bytes held
+    "CACHE_THRESHOLD": 10000,
+    "CACHE_DEFAULT_TIMEOUT": 300,
 }
+CACHE_CONFIG.update({k: v for k, v in CONFIG.get("cache", {}).items() if k.isupper()})
 
+# Live DataFrames kept in each worker in front of the shared tier
+LOCAL_CACHE_MAX_ENTRIES = CONFIG.get("cache", {}).get("local_max_entries", 64)
+LOCAL_CACHE_MAX_BYTES = CONFIG.get("cache", {}).get("local_max_mb", 512) * 1_000_000
 
-def create_new_cache():
+# Serialized DataFrames and callback outputs kept in the shared tier
+SHARED_CACHE_MAX_BYTES = CONFIG.get("cache", {}).get("shared_max_mb", 4096) * 1_000_000
+
+# How DataFrames are written to the shared tier: arrow, parquet or pickle.
+# Large Arrow frames of a FileSystemCache are spilled to files next to it
+# and memory mapped on read
+CACHE_SERIALIZER = CONFIG.get("cache", {}).get("serializer", ARROW)
+CACHE_MMAP_MIN_BYTES = CONFIG.get("cache", {}).get("mmap_min_mb", 8) * 1_000_000
+
+# Seconds a worker may hold the shared lock while loading a dataset, and
+# seconds other callers wait on it before loading the dataset themselves
+CACHE_LOCK_TIMEOUT = CONFIG.get("cache", {}).get("lock_timeout", 120)
+CACHE_LOCK_WAIT = CONFIG.get("cache", {}).get("lock_wait", 90)
+
+# Load the default view of each tab at boot and before it expires
+CACHE_WARM = CONFIG.get("cache", {}).get("warm", True)
+CACHE_WARM_LEAD = CONFIG.get("cache", {}).get("warm_lead", 120)
+
+# Seconds between complete reloads of incrementally refreshed datasets
+INCREMENTAL_FULL_RELOAD = CONFIG.get("cache", {}).get("incremental_full_reload", 86400)
+
+# Seconds between checks of whether the tables behind cached datasets changed
+SOURCE_PROBE_INTERVAL = CONFIG.get("cache", {}).get("source_probe_interval", 30)
+
+# Seconds between each worker publishing its stats for the cache stats tab
+STATS_PUBLISH_INTERVAL = CONFIG.get("cache", {}).get("stats_interval", 15)
+
+
+def get_cache_server() -> Flask:
     try:
         app = dash.get_app()
-        server = app.server
+        server: Flask = app.server
     except Exception:
         # Ok if importing via repl
         logger.warning("Dash app not set first, not caching across dash server")
-        from flask import Flask
-
         server = Flask(__name__)
-    cache = Cache(
+    return server
+
+
+def create_control_cache(server: Flask) -> Cache:
+    """Store for keys that must outlive data evictions, see TieredCache.
+
+    With FileSystemCache a directory of its own without a file count
+    threshold, cachelib prunes the keys stored without a timeout first.
+    """
+    if CACHE_CONFIG["CACHE_TYPE"] != "FileSystemCache":
+        return Cache(app=server, config=CACHE_CONFIG)
+    config = {
+        **CACHE_CONFIG,
+        "CACHE_DIR": CACHE_CONFIG["CACHE_DIR"].rstrip("/") + "-control",
+        "CACHE_THRESHOLD": 0,
+    }
+    return Cache(app=server, config=config)
+
+
+def create_shared_locks(control: Cache) -> SharedLocks:
+    # cachelib's FileSystemCache add is not atomic across workers
+    if CACHE_CONFIG["CACHE_TYPE"] == "FileSystemCache":
+        return FileLocks(pathlib.Path(CACHE_CONFIG["CACHE_DIR"].rstrip("/") + "-locks"))
+    return CacheLocks(control)
+
+
+def create_new_cache(server: Flask, control: Cache, locks: SharedLocks) -> TieredCache:
+    shared_cache = Cache(
         app=server,
         config=CACHE_CONFIG,
     )
-    with server.app_context():
-        cache.clear()
+    spill_dir = None
+    if CACHE_CONFIG["CACHE_TYPE"] == "FileSystemCache":
+        spill_dir = pathlib.Path(CACHE_CONFIG["CACHE_DIR"].rstrip("/") + "-frames")
+    cache = TieredCache(
+        shared=shared_cache,
+        control=control,
+        local_max_entries=LOCAL_CACHE_MAX_ENTRIES,
+        local_max_bytes=LOCAL_CACHE_MAX_BYTES,
+        serializer=FrameSerializer(
+            CACHE_SERIALIZER,
+            spill_dir=spill_dir,
+            mmap_min_bytes=CACHE_MMAP_MIN_BYTES,
+        ),
+        budget=SharedBudget(
+            shared_cache, control, locks=locks, max_bytes=SHARED_CACHE_MAX_BYTES
+        ),
+    )
     return cache
 
 
-CACHE = create_new_cache()
+CACHE_SERVER = get_cache_server()
+CACHE_CONTROL = create_control_cache(CACHE_SERVER)
+SHARED_LOCKS = create_shared_locks(CACHE_CONTROL)
+CACHE = create_new_cache(CACHE_SERVER, CACHE_CONTROL, SHARED_LOCKS)
+SOURCE_FRESHNESS = SourceFreshness(
+    probe=query_source_versions, interval=SOURCE_PROBE_INTERVAL
+)
+SINGLE_FLIGHT = SingleFlight(
+    CACHE,
+    locks=SHARED_LOCKS,
+    lock_timeout=CACHE_LOCK_TIMEOUT,
+    wait_timeout=CACHE_LOCK_WAIT,
+)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Network marketshare views refresh daily, crawler logs change hourly
+DATASET_POLICIES = {
+    NETWORKS: CachePolicy(ttl=DAY, max_staleness=DAY, priority=3),
+    NETWORKS_WITH_APP_METRICS: CachePolicy(ttl=DAY, max_staleness=DAY, priority=3),
+    NETWORK_UNIQUES: CachePolicy(ttl=DAY, max_staleness=DAY, priority=3),
+    TXT_VIEW: CachePolicy(ttl=HOUR, max_staleness=DAY, priority=1),
+    DEVELOPERS_SEARCH: CachePolicy(ttl=HOUR, max_staleness=DAY, priority=1),
+    INTERNAL_LOGS: CachePolicy(ttl=10 * 60, max_staleness=DAY, priority=2),
+    STORE_APPS_HISTORY: CachePolicy(ttl=30 * 60, max_staleness=DAY, priority=2),
+    PUB_URLS_HISTORY: CachePolicy(ttl=30 * 60, max_staleness=DAY, priority=2),
+    APP_SOURCES: CachePolicy(ttl=HOUR, max_staleness=DAY, priority=2),
+}
+DEFAULT_CACHE_POLICY = CachePolicy(ttl=CACHE_CONFIG["CACHE_DEFAULT_TIMEOUT"])
+
+
+def get_cache_policy(dataset_id: str) -> CachePolicy:
+    return DATASET_POLICIES.get(dataset_id, DEFAULT_CACHE_POLICY)
+
+
+# Functions that build each dataset, cache keys change with their source so
+# a deploy only invalidates datasets whose query changed
+DATASET_QUERIES: dict[str, list[Callable[..., Any]]] = {
+    NETWORKS_WITH_APP_METRICS: [query_networks_with_app_metrics],
+    STORE_APPS_HISTORY: [query_store_apps_overview],
+    PUB_URLS_HISTORY: [query_pub_domains_overview],
+    APP_SOURCES: [query_app_store_sources],
+    INTERNAL_LOGS: [
+        query_app_updated_timestamps,
+        query_developer_updated_timestamps,
+        query_updated_version_code_timestamps,
+        query_updated_timestamps,
+        make_date_spine,
+    ],
+    TXT_VIEW: [get_app_txt_view, stream_app_txt_view, _app_txt_view_query],
+    NETWORK_UNIQUES: [query_network_uniqueness],
+    NETWORKS: [query_networks_count],
+    DEVELOPERS_SEARCH: [
+        query_search_developers,
+        stream_search_developers,
+        _search_developers_query,
+    ],
+}
+
+
+@functools.cache
+def dataset_fingerprint(dataset_id: str) -> str:
+    """Hash of the code and dtypes that shape dataset_id's cached frames."""
+    functions: list[Callable[..., Any]] = [
+        *DATASET_QUERIES.get(dataset_id, []),
+        query_dataset,
+        stream_query_chunks,
+        optimize_dtypes,
+    ]
+    source = "".join(inspect.getsource(f) for f in functions)
+    source += json.dumps(DATASET_CATEGORIES.get(dataset_id, []))
+    return hashlib.sha1(source.encode()).hexdigest()[:10]
+
+
+def dataset_key(query_dict: dict) -> str:
+    fingerprint = dataset_fingerprint(query_dict["id"])
+    return f"dataset:{fingerprint}:{json.dumps(query_dict)}"
+
+
+# Datasets filtered on column >= start_date, a cached frame with an earlier
+# start_date holds every row of a later one
+DATE_RANGE_COLUMNS = {
+    STORE_APPS_HISTORY: "updated_at",
+    PUB_URLS_HISTORY: "updated_at",
+    APP_SOURCES: "date",
+    INTERNAL_LOGS: "date",
+}
+
+
+def _range_index_key(query_dict: dict) -> str:
+    base = {k: v for k, v in query_dict.items() if k != "start_date"}
+    fingerprint = dataset_fingerprint(query_dict["id"])
+    return f"ranges:{fingerprint}:{json.dumps(base, sort_keys=True)}"
+
+
+def register_date_range(query_dict: dict) -> None:
+    """Record that query_dict's start_date is cached for its other inputs."""
+    if query_dict["id"] not in DATE_RANGE_COLUMNS:
+        return
+    index_key = _range_index_key(query_dict)
+    entry, _ = CACHE.get(index_key)
+    start_dates = set(entry.value) if entry is not None else set()
+    start_dates.add(query_dict["start_date"])
+    policy = get_cache_policy(query_dict["id"])
+    index_policy = CachePolicy(ttl=policy.ttl + policy.max_staleness)
+    CACHE.set(
+        index_key,
+        index_policy.make_entry(sorted(start_dates), dataset_id=query_dict["id"]),
+    )
+
+
+def find_covering_query(query_dict: dict) -> dict | None:
+    """Cached query_dict with an earlier start_date that covers query_dict.
+
+    None if there is none or query_dict itself is cached.
+    """
+    if query_dict["id"] not in DATE_RANGE_COLUMNS:
+        return None
+    entry, _ = CACHE.get(_range_index_key(query_dict))
+    if entry is None:
+        return None
+    # The latest cached start_date that still covers the request is the
+    # smallest frame to slice
+    for start_date in sorted(entry.value, reverse=True):
+        if start_date > query_dict["start_date"]:
+            continue
+        if start_date == query_dict["start_date"]:
+            return None
+        covering = {**query_dict, "start_date": start_date}
+        # The marker, get_cached_dataframe loads the frame itself
+        if CACHE.get_marker(dataset_key(covering)) is not None:
+            return covering
+    return None
+
+
+def slice_date_range(df: pd.DataFrame, query_dict: dict) -> pd.DataFrame:
+    """Rows of a covering frame that query_dict's own query returns."""
+    dates = pd.to_datetime(df[DATE_RANGE_COLUMNS[query_dict["id"]]])
+    start = pd.Timestamp(query_dict["start_date"])
+    if dates.dt.tz is not None:
+        start = start.tz_localize(dates.dt.tz)
+    df = df[dates >= start].reset_index(drop=True)
+    return df
+
+
+# Tables read by each dataset, refreshed by the crawler on its own schedule
+SOURCE_RELATIONS = {
+    NETWORKS: ["public.network_counts", "public.network_counts_top"],
+    NETWORKS_WITH_APP_METRICS: ["public.networks_with_app_metrics"],
+    NETWORK_UNIQUES: ["public.publisher_url_developer_ids_uniques"],
+    STORE_APPS_HISTORY: ["logging.store_apps_snapshot"],
+    PUB_URLS_HISTORY: ["logging.snapshot_pub_domains"],
+    APP_SOURCES: ["public.store_apps_created_at"],
+}
+INTERNAL_LOGS_RELATIONS = {
+    "store_apps": ["public.store_apps_updated_at", "public.store_apps_created_at"],
+    "developers": ["public.developers", "logging.developers_crawled_at"],
+    "version_codes": ["public.version_codes", "public.store_apps"],
+}
+
+
+def get_source_relations(query_dict: dict) -> list[str]:
+    if query_dict["id"] == INTERNAL_LOGS:
+        table_name = query_dict["table_name"]
+        return INTERNAL_LOGS_RELATIONS.get(table_name, [f"public.{table_name}"])
+    return SOURCE_RELATIONS.get(query_dict["id"], [])
+
+
+def source_changed(query_dict: dict, entry: CacheEntry) -> bool | None:
+    """Whether the tables behind entry changed since it loaded, None if unknown."""
+    relations = get_source_relations(query_dict)
+    if not relations or entry.source_version is None:
+        return None
+    version = SOURCE_FRESHNESS.version(relations)
+    if version is None:
+        return None
+    return version != entry.source_version
+
+
+def entry_is_current(query_dict: dict, entry: CacheEntry, lead: float = 0) -> bool:
+    """Whether entry can be served without a reload.
 
+    Entries of probed sources stay current until the source changes, others
+    until lead seconds before their ttl runs out.
+    """
+    changed = source_changed(query_dict, entry)
+    if changed is None:
+        return entry.fresh_until - time.time() > lead
+    return not changed
 
-@CACHE.memoize()
-def get_cached_dataframe(query_json):
+
+def renew_unchanged_entry(query_dict: dict, key: str, entry: CacheEntry) -> None:
+    """Restart the ttl of an entry past it whose source did not change."""
+    if entry.is_fresh() or source_changed(query_dict, entry) is not False:
+        return
+    # entry may hold only the columns a caller read, renew the whole frame
+    cached, _ = CACHE.get(key)
+    if cached is None or cached.created_at != entry.created_at:
+        return
+    policy = get_cache_policy(query_dict["id"])
+    CACHE.set(key, policy.renew(cached))
+    METRICS.inc("dataset_source_unchanged_total", dataset=query_dict["id"])
+
+
+def get_cached_dataframe(
+    query_json: str, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """The dataset of query_json, cached or loaded.
+
+    With columns only those are returned, a shared tier hit reads just them
+    from the stored frame.
+    """
+    query_dict = json.loads(query_json)
+    covering = find_covering_query(query_dict)
+    if covering is not None:
+        METRICS.inc("dataset_range_hits_total", dataset=query_dict["id"])
+        read = columns
+        if columns:
+            # Sliced on its date column, dropped after if not asked for
+            date_col = DATE_RANGE_COLUMNS[query_dict["id"]]
+            read = list(dict.fromkeys([*columns, date_col]))
+        covering_df = get_cached_dataframe(json.dumps(covering), columns=read)
+        sliced = slice_date_range(covering_df, query_dict)
+        return sliced[columns] if columns else sliced
+    key = dataset_key(query_dict)
+    entry, tier = CACHE.get(key, columns=columns)
+    if entry is not None and entry_is_current(query_dict, entry):
+        renew_unchanged_entry(query_dict, key, entry)
+        METRICS.inc("dataset_hits_total", dataset=query_dict["id"], tier=str(tier))
+        record_dependency(query_json, entry.created_at)
+        df: pd.DataFrame = copy_value(entry.value)
+        return df
+    if entry is not None:
+        # Past ttl or source changed, within max_staleness: serve it now and
+        # reload it for the next caller, if the reload fails the stale entry stays
+        SINGLE_FLIGHT.refresh_in_background(
+            key,
+            lambda: load_dataset_entry(query_dict),
+            accept=lambda entry: entry_is_current(query_dict, entry),
+        )
+        METRICS.inc("dataset_stale_served_total", dataset=query_dict["id"])
+        record_dependency(query_json, entry.created_at)
+        return copy_value(entry.value)
+    entry, loaded = SINGLE_FLIGHT.load(
+        key,
+        lambda: load_dataset_entry(query_dict),
+        accept=lambda entry: entry_is_current(query_dict, entry),
+    )
+    if not loaded:
+        # Another thread or worker ran the query while this call waited
+        METRICS.inc("dataset_coalesced_total", dataset=query_dict["id"])
+    record_dependency(query_json, entry.created_at)
+    df = copy_value(entry.value)
+    return df[columns] if columns else df
+
+
+def dataset_unchanged(query_json: str, created_at: float) -> bool:
+    """Whether the dataset entry loaded at created_at is still cached and current."""
     query_dict = json.loads(query_json)
-    if query_dict["id"] == "networks-with-app-metrics":
+    # The marker, loading the frame would cost what the artifact hit saves
+    entry = CACHE.get_marker(dataset_key(query_dict))
+    return (
+        entry is not None
+        and entry.created_at == created_at
+        and entry_is_current(query_dict, entry)
+    )
+
+
+# Callback outputs built from cached datasets, see ArtifactCache
+ARTIFACTS = ArtifactCache(
+    CACHE, policy=CachePolicy(ttl=DAY, priority=1), is_current=dataset_unchanged
+)
+
+
+# Daily series where only the latest days change, refreshes re-query those
+# days and keep the rest of the cached series
+INCREMENTAL_DATASETS = {INTERNAL_LOGS}
+
+
+def refresh_incrementally(query_dict: dict, previous: pd.DataFrame) -> pd.DataFrame:
+    """Re-query from the last closed date of previous onward and merge."""
+    dates = pd.to_datetime(previous["date"])
+    last_closed = pd.Timestamp(datetime.date.today() - datetime.timedelta(days=1))
+    refresh_from = max(
+        min(dates.max(), last_closed), pd.Timestamp(query_dict["start_date"])
+    )
+    recent = query_dataset(
+        {**query_dict, "start_date": refresh_from.strftime(DATE_FORMAT)}
+    )
+    # Newest days first, like the full queries return them
+    df = pd.concat([recent, previous[dates < refresh_from]], ignore_index=True)
+    logger.info(
+        f"Dataset {query_dict=} refreshed from {refresh_from.date()} "
+        f"{len(recent)} new rows"
+    )
+    return df
+
+
+# Low cardinality text columns kept as categoricals, per dataset id
+DATASET_CATEGORIES = {
+    NETWORKS: ["ad_domain_url", "relationship"],
+    NETWORKS_WITH_APP_METRICS: ["ad_domain_url", "relationship", "category"],
+    STORE_APPS_HISTORY: ["store_name", "outcome"],
+    PUB_URLS_HISTORY: ["outcome"],
+    APP_SOURCES: ["store", "crawl_source"],
+    INTERNAL_LOGS: ["store", "crawl_result"],
+}
+# Categoricals only pay off when values repeat, ie at most this share distinct
+MAX_CATEGORY_RATIO = 0.5
+
+
+def optimize_dtypes(df: pd.DataFrame, dataset_id: str) -> pd.DataFrame:
+    """Cast the dataset's categorical columns and downcast int64 counts.
+
+    Integers go to int32 at the smallest, so sums of a few columns in the
+    pages can not overflow. Floats are kept as they are.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    # Joined queries, eg developer search's d.*, repeat labels like id, where
+    # df[column] is a DataFrame, those columns are left as they are
+    unique = set(df.columns[~df.columns.duplicated(keep=False)])
+    casts: dict[str, str] = {}
+    for column in DATASET_CATEGORIES.get(dataset_id, []):
+        if column not in unique or isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        if df[column].nunique(dropna=False) <= len(df) * MAX_CATEGORY_RATIO:
+            casts[column] = "category"
+    int32 = np.iinfo(np.int32)
+    for column in df.select_dtypes(include="int64").columns:
+        if column not in unique:
+            continue
+        if df[column].empty or (
+            df[column].min() >= int32.min and df[column].max() <= int32.max
+        ):
+            casts[column] = "int32"
+    if not casts:
+        return df
+    df = df.astype(casts)
+    after = int(df.memory_usage(deep=True).sum())
+    METRICS.inc("dataset_dtype_saved_bytes_total", before - after, dataset=dataset_id)
+    logger.info(
+        f"Dataset {dataset_id} dtypes optimized {before / 1e6:.2f}MB -> "
+        f"{after / 1e6:.2f}MB {sorted(casts)}"
+    )
+    return df
+
+
+def load_dataset_entry(query_dict: dict) -> CacheEntry:
+    policy = get_cache_policy(query_dict["id"])
+    previous = None
+    if query_dict["id"] in INCREMENTAL_DATASETS:
+        previous, _ = CACHE.get(dataset_key(query_dict))
+        if previous is not None and (
+            time.time() - previous.full_load_at > INCREMENTAL_FULL_RELOAD
+            or previous.value.empty
+        ):
+            previous = None
+    # Taken before the query so a change made while it runs is not missed
+    source_version = None
+    relations = get_source_relations(query_dict)
+    if relations:
+        source_version = SOURCE_FRESHNESS.current_version(relations)
+    timer = QueryTimer()
+    with dataset_context(query_dict["id"]), track_servers() as servers:
+        if previous is not None:
+            df = refresh_incrementally(query_dict, previous.value)
+        else:
+            df = query_dataset(query_dict)
+    if servers - {PRIMARY_SERVER}:
+        # Markers are probed on the primary, a lagging replica may have served
+        # rows from before the change they count, so keep the entry to its ttl
+        source_version = None
+    df = optimize_dtypes(df, query_dict["id"])
+    timer.mark("load")
+    METRICS.inc("dataset_misses_total", dataset=query_dict["id"])
+    METRICS.observe("dataset_load_seconds", timer.total, dataset=query_dict["id"])
+    logger.info(f"Dataset {query_dict=} loaded in {timer.total:.3f}s {df.shape=}")
+    entry = policy.make_entry(
+        df,
+        dataset_id=query_dict["id"],
+        load_seconds=timer.total,
+        full_load_at=previous.full_load_at if previous is not None else None,
+        source_version=source_version,
+    )
+    register_date_range(query_dict)
+    return entry
+
+
+def get_warm_queries() -> list[dict]:
+    """Query dicts of the views tabs open with.
+
+    Network categories are filtered from the one networks-with-app-metrics
+    dataset, so warming it covers every category in app_categories.
+    """
+    start_date = get_earlier_date(days=30)
+    queries: list[dict] = [
+        {"id": NETWORKS, "top_only": False},
+        {"id": NETWORKS, "top_only": True},
+        {"id": NETWORKS_WITH_APP_METRICS},
+        {"id": NETWORK_UNIQUES},
+    ]
+    queries += [
+        {"id": INTERNAL_LOGS, "table_name": table_name, "start_date": start_date}
+        for table_name in DB_METADATA.tables_with_times
+    ]
+    return queries
+
+
+def warm_dataset(query_dict: dict) -> CacheEntry:
+    """Cached entry for query_dict, reloaded when it is about to go stale."""
+    key = dataset_key(query_dict)
+    entry, _ = SINGLE_FLIGHT.load(
+        key,
+        lambda: load_dataset_entry(query_dict),
+        accept=lambda entry: entry_is_current(query_dict, entry, CACHE_WARM_LEAD),
+    )
+    renew_unchanged_entry(query_dict, key, entry)
+    return entry
+
+
+CACHE_WARMER = CacheWarmer(
+    targets=get_warm_queries, warm=warm_dataset, lead_seconds=CACHE_WARM_LEAD
+)
+
+DATASET_COUNTERS = {
+    "dataset_hits_total": "hits",
+    "dataset_misses_total": "misses",
+    "dataset_stale_served_total": "stale_served",
+    "dataset_coalesced_total": "coalesced",
+    "dataset_range_hits_total": "range_hits",
+}
+
+
+def collect_worker_stats() -> dict:
+    """Dataset cache counters, memory held and recent queries of this worker."""
+    datasets: dict[str, dict] = {}
+    for counter, column in DATASET_COUNTERS.items():
+        for labels, value in METRICS.counter_values(counter).items():
+            label_dict = dict(labels)
+            dataset = datasets.setdefault(label_dict.get("dataset", ""), {})
+            name = column
+            if column == "hits":
+                name = f"hits_{label_dict.get('tier', 'local')}"
+            dataset[name] = dataset.get(name, 0) + value
+    for dataset_id, held in CACHE.local.stats().items():
+        datasets.setdefault(dataset_id, {}).update(held)
+    return {
+        "datasets": datasets,
+        "queries": METRICS.recent_events(),
+        "in_flight": SINGLE_FLIGHT.in_flight(),
+        "warm_progress": dict(CACHE_WARMER.progress),
+    }
+
+
+WORKER_STATS = WorkerStats(
+    CACHE.control, collect=collect_worker_stats, interval=STATS_PUBLISH_INTERVAL
+)
+
+
+def get_cache_stats() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
+    """Per dataset stats summed over workers, recent queries and in flight keys."""
+    snapshots = WORKER_STATS.read_all()
+    now = time.time()
+    dataset_rows = []
+    query_rows = []
+    in_flight: set[str] = set()
+    for snapshot in snapshots:
+        for dataset_id, stats in snapshot["datasets"].items():
+            dataset_rows.append({"dataset": dataset_id, **stats})
+        for event in snapshot["queries"]:
+            query_rows.append({"worker": snapshot["worker"], **event})
+        in_flight.update(snapshot["in_flight"])
+    datasets = pd.DataFrame(dataset_rows)
+    if not datasets.empty:
+        aggs = {column: "sum" for column in datasets.columns if column != "dataset"}
+        if "oldest_created_at" in datasets.columns:
+            aggs["oldest_created_at"] = "min"
+            # Zero marks datasets a worker no longer holds
+            datasets["oldest_created_at"] = datasets["oldest_created_at"].replace(
+                0, float("nan")
+            )
+        datasets = datasets.groupby("dataset").agg(aggs).reset_index()
+        if "oldest_created_at" in datasets.columns:
+            oldest = datasets.pop("oldest_created_at")
+            datasets["oldest_entry_minutes"] = (now - oldest) / 60
+        # range_hits are also counted as a hit of the covering dataset
+        hit_columns = [f"hits_{CACHE.LOCAL}", f"hits_{CACHE.SHARED}"]
+        hits = datasets.reindex(columns=hit_columns, fill_value=0).sum(axis=1)
+        lookups = hits + datasets.get("misses", 0) + datasets.get("stale_served", 0)
+        datasets["hit_percent"] = hits / lookups.where(lookups > 0)
+        datasets["mb"] = datasets.get("bytes", 0) / 1e6
+        datasets["workers"] = len(snapshots)
+    if CACHE.budget is not None:
+        # Held once for every worker, not summed over snapshots
+        shared = pd.DataFrame(
+            [
+                {
+                    "dataset": dataset_id,
+                    "shared_entries": stats["entries"],
+                    "shared_mb": stats["bytes"] / 1e6,
+                }
+                for dataset_id, stats in CACHE.budget.stats().items()
+            ],
+            columns=["dataset", "shared_entries", "shared_mb"],
+        )
+        datasets = shared if datasets.empty else datasets.merge(shared, how="outer")
+    queries = pd.DataFrame(query_rows)
+    if not queries.empty:
+        queries = queries.sort_values("at", ascending=False)
+        queries["at"] = pd.to_datetime(queries["at"], unit="s").dt.strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        queries["params"] = queries["params"].astype(str)
+    return datasets, queries, sorted(in_flight)
+
+
+def query_dataset(query_dict: dict) -> pd.DataFrame:
+    if query_dict["id"] == NETWORKS_WITH_APP_METRICS:
         df = query_networks_with_app_metrics()
     elif query_dict["id"] == STORE_APPS_HISTORY:
         df = query_store_apps_overview(start_date=query_dict["start_date"])
@@ -105,6 +724,141 @@ def get_cached_dataframe(query_json):
     return df
 
 
+# Control store keys of a streaming load, progress at the prefix and chunk i
+# at prefix:i, so any worker can answer the table's polls
+STREAM_PREFIX = "stream:"
+# Seconds before polls re-run a failed streamed query, a new search runs it
+# at once
+STREAM_RETRY_SECONDS = 60
+
+
+def stream_query_chunks(query_dict: dict) -> Iterator[pd.DataFrame]:
+    if query_dict["id"] == TXT_VIEW:
+        chunks = stream_app_txt_view(query_dict["developer_url"])
+    elif query_dict["id"] == DEVELOPERS_SEARCH:
+        chunks = stream_search_developers(
+            search_input=query_dict["search_input"], limit=1000
+        )
+    else:
+        raise ValueError(f"query_dict id: {query_dict['id']} can not be streamed")
+    return chunks
+
+
+def stream_dataset(query_dict: dict, key: str, lock_key: str, token: str) -> None:
+    """Run a streamed query, sharing chunks as they arrive, then cache the frame."""
+    progress_key = STREAM_PREFIX + key
+    policy = get_cache_policy(query_dict["id"])
+    timeout = int(CACHE_LOCK_TIMEOUT + CACHE_LOCK_WAIT)
+    chunks: list[pd.DataFrame] = []
+    progress: dict[str, Any]
+    timer = QueryTimer()
+    try:
+        with dataset_context(query_dict["id"]):
+            for chunk in stream_query_chunks(query_dict):
+                CACHE.control.set(
+                    f"{progress_key}:{len(chunks)}", chunk, timeout=timeout
+                )
+                chunks.append(chunk)
+                progress = {"chunks": len(chunks), "done": False, "failed": False}
+                CACHE.control.set(progress_key, progress, timeout=timeout)
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        df = optimize_dtypes(df, query_dict["id"])
+        timer.mark("load")
+        METRICS.inc("dataset_misses_total", dataset=query_dict["id"])
+        METRICS.observe("dataset_load_seconds", timer.total, dataset=query_dict["id"])
+        entry = policy.make_entry(
+            df, dataset_id=query_dict["id"], load_seconds=timer.total
+        )
+        CACHE.set(key, entry)
+        progress = {"chunks": len(chunks), "done": True, "failed": False}
+    except Exception:
+        logger.exception(f"Streamed query failed {query_dict=}")
+        progress = {
+            "chunks": len(chunks),
+            "done": True,
+            "failed": True,
+            "failed_at": time.time(),
+        }
+    finally:
+        CACHE.control.set(progress_key, progress, timeout=timeout)
+        SHARED_LOCKS.release(lock_key, token)
+    # Readers take the cached frame once done, the chunks are no longer read
+    for i in range(len(chunks)):
+        CACHE.control.delete(f"{progress_key}:{i}")
+
+
+def start_stream(query_dict: dict, key: str) -> bool:
+    """Start streaming query_dict unless a worker already is, returns if started."""
+    lock_key = LOCK_PREFIX + STREAM_PREFIX + key
+    token = uuid.uuid4().hex
+    if not SHARED_LOCKS.acquire(lock_key, token, CACHE_LOCK_TIMEOUT):
+        return False
+    progress = {"chunks": 0, "done": False, "failed": False}
+    timeout = int(CACHE_LOCK_TIMEOUT + CACHE_LOCK_WAIT)
+    CACHE.control.set(STREAM_PREFIX + key, progress, timeout=timeout)
+    threading.Thread(
+        target=stream_dataset,
+        args=(query_dict, key, lock_key, token),
+        name="stream-dataset",
+        daemon=True,
+    ).start()
+    return True
+
+
+def get_streamed_dataframe(
+    query_json: str, wait_seconds: float = 10, retry: bool = False
+) -> tuple[pd.DataFrame, bool]:
+    """Rows loaded so far for a streamable query and whether loading is done.
+
+    The first call starts the query on one worker, calls on any worker then
+    return the chunks it has shared. The finished frame is cached with the
+    dataset's policy, past its ttl it is still returned while it reloads.
+    A failed query counts as done, it is re-run with retry or after
+    STREAM_RETRY_SECONDS.
+    """
+    query_dict = json.loads(query_json)
+    key = dataset_key(query_dict)
+    entry, tier = CACHE.get(key)
+    if entry is not None:
+        if entry_is_current(query_dict, entry):
+            METRICS.inc("dataset_hits_total", dataset=query_dict["id"], tier=str(tier))
+        else:
+            start_stream(query_dict, key)
+            METRICS.inc("dataset_stale_served_total", dataset=query_dict["id"])
+        return copy_value(entry.value), True
+    progress_key = STREAM_PREFIX + key
+    progress = CACHE.control.get(progress_key)
+    if progress is not None and progress["failed"]:
+        failed_for = time.time() - progress.get("failed_at", 0)
+        if not retry and failed_for < STREAM_RETRY_SECONDS:
+            # Polls stop here, rather than re-run the query every interval
+            return pd.DataFrame(), True
+        start_stream(query_dict, key)
+    elif progress is None or progress["done"]:
+        # Not started, or finished with the frame since evicted
+        start_stream(query_dict, key)
+    deadline = time.monotonic() + wait_seconds
+    while time.monotonic() < deadline:
+        progress = CACHE.control.get(progress_key)
+        if progress is not None and (progress["chunks"] or progress["done"]):
+            break
+        time.sleep(0.1)
+    if progress is None:
+        return pd.DataFrame(), False
+    if progress["done"] and not progress["failed"]:
+        entry = CACHE.get_shared(key)
+        if entry is not None:
+            return copy_value(entry.value), True
+    chunks = []
+    for i in range(progress["chunks"]):
+        chunk = CACHE.control.get(f"{progress_key}:{i}")
+        if chunk is None:
+            break
+        chunks.append(chunk)
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    return df, bool(progress["done"])
+
+
 def limit_rows_for_plotting(
     df: pd.DataFrame,
     row_ids: list[str] | None,
@@ -122,7 +876,7 @@ def limit_rows_for_plotting(
         else:
             logger.warning("Limit plot ids: No row_ids! manual select")
             sort_column = "count"
-        idf = df.groupby("id")[sort_column].sum().reset_index()
+        idf = df.groupby("id", observed=True)[sort_column].sum().reset_index()
         idf = (
             idf.sort_values(sort_column, ascending=sort_ascending)
             .reset_index(drop=True)
@@ -130,14 +884,33 @@ def limit_rows_for_plotting(
         )
         row_ids = idf["id"].unique().tolist()
         df = df[df["id"].isin(row_ids)]
+    if isinstance(df["id"].dtype, pd.CategoricalDtype):
+        # Plots group on the id codes, drop ids that were filtered out
+        df = df.assign(id=df["id"].cat.remove_unused_categories())
     logger.info(f"Limit plot ids: {original_shape=} new_shape: {df.shape}")
     return df
 
 
 def add_id_column(df: pd.DataFrame, dimensions: list[str]) -> pd.DataFrame:
-    df["id"] = df[dimensions].apply(
-        lambda row: " ".join(row.to_numpy().astype(str)), axis=1
-    )
+    """Add id, the dimension values joined by spaces, as a categorical.
+
+    Rows are numbered by their distinct dimension values and only those
+    distinct values are joined, so the id column holds integer codes with
+    the joined labels as its categories.
+    """
+    if not dimensions:
+        df["id"] = pd.Categorical([""] * len(df))
+        return df
+    keys = df[dimensions]
+    codes = keys.groupby(dimensions, dropna=False, sort=False, observed=True).ngroup()
+    uniques = keys.drop_duplicates()
+    columns = [uniques[x].to_numpy(dtype=object).astype(str) for x in dimensions]
+    labels = pd.Index([" ".join(values) for values in zip(*columns, strict=True)])
+    if labels.is_unique:
+        df["id"] = pd.Categorical.from_codes(codes.to_numpy(), categories=labels)
+    else:
+        # Distinct values can print the same, eg None and "None"
+        df["id"] = pd.Categorical(labels.to_numpy()[codes.to_numpy()])
     return df
 
 